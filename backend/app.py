@@ -1,10 +1,11 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, g, Response
 from flask_cors import CORS
 import json
 import os
 from datetime import datetime, timedelta
-import random
 import hashlib
+import bisect
+import time
 import jwt
 from functools import wraps
 
@@ -14,135 +15,192 @@ CORS(app)
 # JWT密钥
 SECRET_KEY = "radio_exam_secret_key_2024"
 
+from config import (DATA_DIR, STORAGE_BACKEND, SQLITE_PATH, JSON_WRITE_BEHIND, JOURNAL_PATH,
+                    JOURNAL_COMMIT_WINDOW_MS, JOURNAL_COMPACT_INTERVAL, USER_CACHE_CHECK_INTERVAL,
+                    QUESTION_PAGE_SIZE, QUESTION_PAGE_SIZE_MAX, DEFAULT_EXAM_BLUEPRINT, REVIEW_QUEUE_TTL,
+                    EXAM_SESSION_TTL, EXAM_SESSION_MAX, EXAM_SESSION_PERSIST, EXAM_SESSION_PURGE_INTERVAL,
+                    STATUS_RESYNC_INTERVAL,
+                    METRICS_DIR, METRICS_FLUSH_INTERVAL,
+                    TOKEN_CACHE_SIZE, BULK_USER_MAX, COUNTER_FLUSH_INTERVAL, PORT, DEBUG)
+
 # 数据文件路径
-DATA_DIR = "data"
 QUESTIONS_FILE = os.path.join(DATA_DIR, "questions.json")
-WRONG_QUESTIONS_FILE = os.path.join(DATA_DIR, "wrong_questions.json")
+WRONG_QUESTIONS_DIR = os.path.join(DATA_DIR, "wrong_questions")  # 按用户分片的错题本目录
 USERS_FILE = os.path.join(DATA_DIR, "users.json")
 
 # 确保数据目录存在
 os.makedirs(DATA_DIR, exist_ok=True)
 
-# 导入PDF解析器
-try:
-    from pdf_parser import load_questions
-except ImportError:
-    print("PDF解析器导入失败，使用内置解析器")
-    
-    def load_questions():
-        """内置题目加载器"""
-        if os.path.exists(QUESTIONS_FILE):
-            with open(QUESTIONS_FILE, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        else:
-            print("获取题目失败")
-            return {}
+# 存储后端（用户数据和错题本），默认使用JSON文件
+if STORAGE_BACKEND == 'sqlite':
+    from sqlite_store import SQLiteStore
+    store = SQLiteStore(SQLITE_PATH)
+elif JSON_WRITE_BEHIND:
+    from json_store import JsonStore
+    from journal_store import JournaledJsonStore
+    store = JournaledJsonStore(JsonStore(USERS_FILE, WRONG_QUESTIONS_DIR, fsync=True,
+                                         counters_flush_interval=COUNTER_FLUSH_INTERVAL), JOURNAL_PATH,
+                               commit_window=JOURNAL_COMMIT_WINDOW_MS / 1000.0,
+                               compact_interval=JOURNAL_COMPACT_INTERVAL)
+else:
+    from json_store import JsonStore
+    store = JsonStore(USERS_FILE, WRONG_QUESTIONS_DIR, counters_flush_interval=COUNTER_FLUSH_INTERVAL)
+
+# 常驻内存的用户目录（手机号索引、预解析的有效期）
+from user_directory import UserDirectory, UserEntry, check_claims_window
+
+user_directory = UserDirectory(store, check_interval=USER_CACHE_CHECK_INTERVAL)
+
+# 常驻内存的题库（文件变化时自动重新加载）
+from question_bank import question_bank, encode_json
+from http_cache import send_precompressed
+import exam_blueprints
+from grading import check_answer, check_mask, mask_to_answer
+from exam_sessions import ExamSessionStore
+import question_stats
+from system_status import WrongBookCounters
+from review_scheduler import ReviewQueues, schedule_correct, schedule_wrong
+from question_search import highlight
+from token_cache import TokenCache
+import user_provisioning
+import metrics
+
+# 错题本的复习队列（按 SM-2 计算的复习时间排序）
+review_queues = ReviewQueues(store, ttl=REVIEW_QUEUE_TTL)
+
+# 考试会话（发出的题目和正确答案，交卷时按会话判分）
+exam_sessions = ExamSessionStore(store if EXAM_SESSION_PERSIST else None,
+                                 ttl=EXAM_SESSION_TTL, max_sessions=EXAM_SESSION_MAX,
+                                 purge_interval=EXAM_SESSION_PURGE_INTERVAL)
+
+# 错题本条目数计数器（/api/system/status 使用）
+wrong_book_counters = WrongBookCounters(store, resync_interval=STATUS_RESYNC_INTERVAL)
+
+# 已验证令牌的缓存（同一个令牌重复请求时跳过签名验证）
+token_cache = TokenCache(max_size=TOKEN_CACHE_SIZE)
+
+
+def load_questions():
+    """获取当前题库中的题目"""
+    return question_bank.get_questions()
+
+def exam_response(envelope, questions, bank):
+    """拼接试卷响应：信封字段正常编码，题目直接使用题库中预编码的JSON片段"""
+    head = json.dumps(envelope, ensure_ascii=False, separators=(',', ':'))[:-1].encode('utf-8')
+    if envelope:
+        head += b','
+    body = head + b'"questions":' + bank.encode_questions(questions) + b'}'
+    return Response(body, mimetype='application/json')
+
+def hydrate_wrong_question(q_id, wrong_info, bank=None):
+    """从题库中取错题对应的题目，题库中已删除的题目使用错题本中保存的副本"""
+    bank = bank or question_bank.snapshot()
+    return bank.get(q_id) or wrong_info.get('question')
+
+def wrong_question_ref(q_id, wrong_info, bank=None):
+    """错题记录只保存题号和计数；旧记录中的题目副本在题库中还有这道题时去掉"""
+    if 'question' in wrong_info:
+        bank = bank or question_bank.snapshot()
+        if bank.get(q_id):
+            del wrong_info['question']
+    return wrong_info
 
 
 def save_questions(questions):
     """保存题目数据"""
+    started = time.perf_counter()
     with open(QUESTIONS_FILE, 'w', encoding='utf-8') as f:
         json.dump(questions, f, ensure_ascii=False, indent=2)
+        nbytes = f.tell()
+    metrics.observe_io('save', QUESTIONS_FILE, time.perf_counter() - started, nbytes)
 
 def load_wrong_questions(user_id=None):
     """加载错题数据"""
-    if os.path.exists(WRONG_QUESTIONS_FILE):
-        with open(WRONG_QUESTIONS_FILE, 'r', encoding='utf-8') as f:
-            all_wrong_questions = json.load(f)
-            # 如果指定了用户ID，只返回该用户的错题
-            if user_id:
-                return all_wrong_questions.get(str(user_id), {})
-            # 否则返回所有用户的错题（向后兼容）
-            return all_wrong_questions
-    return {} if user_id else {}
+    # 如果指定了用户ID，只读取该用户的错题
+    if user_id:
+        return store.load_wrong_questions(user_id)
+    # 否则返回所有用户的错题（向后兼容）
+    return store.load_all_wrong_questions()
 
 def save_wrong_questions(wrong_questions, user_id=None):
     """保存错题数据"""
-    # 如果指定了用户ID，保存到该用户的错题本中
+    # 如果指定了用户ID，只重写该用户的错题
     if user_id:
-        # 先加载所有用户的错题数据
-        all_wrong_questions = load_wrong_questions()
-        all_wrong_questions[str(user_id)] = wrong_questions
-        with open(WRONG_QUESTIONS_FILE, 'w', encoding='utf-8') as f:
-            json.dump(all_wrong_questions, f, ensure_ascii=False, indent=2)
+        store.save_wrong_questions(user_id, wrong_questions)
+        wrong_book_counters.set(user_id, len(wrong_questions))
     else:
-        # 直接保存（向后兼容）
-        with open(WRONG_QUESTIONS_FILE, 'w', encoding='utf-8') as f:
-            json.dump(wrong_questions, f, ensure_ascii=False, indent=2)
-
-def normalize_answer(answer):
-    """标准化答案（排序并去重）"""
-    if not answer:
-        return ""
-    # 将答案转换为大写，排序并去重
-    return ''.join(sorted(set(str(answer).upper())))
-
-def is_answer_correct(user_answer, correct_answer):
-    """判断答案是否正确（支持多选题）"""
-    user_normalized = normalize_answer(user_answer)
-    correct_normalized = normalize_answer(correct_answer)
-    return user_normalized == correct_normalized
+        # 整体替换所有用户的错题（向后兼容）
+        store.save_all_wrong_questions(wrong_questions)
+        wrong_book_counters.reset(wrong_questions)
+    review_queues.invalidate(user_id)
+
+def load_wrong_question(user_id, q_id):
+    """加载用户错题本中的一道题，不存在返回 None"""
+    return store.get_wrong_question(user_id, q_id)
+
+def save_question_stats(deltas):
+    """把一次交卷的题目统计增量合并写入计数器；统计写入失败不影响交卷"""
+    if not deltas:
+        return
+    try:
+        store.incr_counters(deltas)
+    except Exception as e:
+        print(f"写入题目统计失败: {e}")
+
+def update_wrong_questions(user_id, changes, added=0):
+    """只写入发生变化的错题记录 {题号: 错题记录或None(删除)}
+
+    added 为其中新加入错题本的题目数；删除的必须是错题本中已有的题目
+    """
+    if changes:
+        store.update_wrong_questions(user_id, changes)
+        review_queues.update(user_id, changes)
+        removed = sum(1 for entry in changes.values() if entry is None)
+        wrong_book_counters.add(user_id, added - removed)
 
 # 用户认证相关函数
 def load_users():
     """加载用户数据"""
-    if os.path.exists(USERS_FILE):
-        with open(USERS_FILE, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    return {}
+    return store.load_users()
 
 def save_users(users):
     """保存用户数据"""
-    with open(USERS_FILE, 'w', encoding='utf-8') as f:
-        json.dump(users, f, ensure_ascii=False, indent=2)
+    store.save_users(users)
+    user_directory.replace_all(users)
+    token_cache.clear()
+
+def save_user(user):
+    """保存单个用户"""
+    previous = user_directory.get(user['user_id'])
+    store.save_user(user)
+    user_directory.put(user)
+    # 版本号变化（令牌被吊销）或修改了密码时清除该用户缓存的令牌
+    if previous and (previous.get('revision', 0) != user.get('revision', 0)
+                     or previous.get('password') != user.get('password')):
+        token_cache.evict_user(user['user_id'])
+
+def save_new_users(new_users):
+    """批量添加用户（只写一次存储），返回因手机号冲突没有添加的用户ID"""
+    rejected = set(store.add_users(new_users))
+    user_directory.put_many([user for user in new_users if user['user_id'] not in rejected])
+    return rejected
+
+def allocate_user_id(allocated=()):
+    """生成不与已有用户和 allocated 中的ID重复的用户ID"""
+    while True:
+        user_id = user_provisioning.new_user_id()
+        if user_id not in allocated and user_directory.get(user_id) is None:
+            return user_id
+
+def delete_user_record(user_id):
+    """删除单个用户"""
+    store.delete_user(user_id)
+    user_directory.remove(user_id)
+    token_cache.evict_user(user_id)
 
 def check_user_access(user):
     """检查用户访问权限（时间限制）"""
-    if user.get('is_admin', False):
-        return {'access': True, 'message': '管理员无时间限制'}
-    
-    now = datetime.now()
-    
-    # 检查开始时间
-    start_time = user.get('start_time')
-    if start_time:
-        try:
-            start_dt = datetime.fromisoformat(start_time.replace('Z', '+00:00'))
-            if now < start_dt:
-                return {'access': False, 'message': '账号未到生效时间'}
-        except:
-            pass
-    
-    # 检查到期时间
-    expire_time = user.get('expire_time')
-    if expire_time:
-        try:
-            expire_dt = datetime.fromisoformat(expire_time.replace('Z', '+00:00'))
-            if now > expire_dt:
-                return {'access': False, 'message': '当前账号已到期，请联系管理员！'}
-        except:
-            pass
-    
-    # 计算剩余天数
-    days_left = None
-    if expire_time:
-        try:
-            expire_dt = datetime.fromisoformat(expire_time.replace('Z', '+00:00'))
-            # 计算总的小时差，然后向上取整到天数
-            total_hours = (expire_dt - now).total_seconds() / 3600
-            if total_hours > 0:
-                # 如果还有时间，至少显示1天
-                days_left = max(1, int((total_hours + 23) // 24))
-            else:
-                days_left = 0
-        except:
-            pass
-    
-    return {
-        'access': True, 
-        'days_left': days_left,
-        'expire_time': expire_time
-    }
+    return UserEntry(user).check_access()
 
 def hash_password(password):
     """密码哈希"""
@@ -152,16 +210,40 @@ def verify_password(password, hashed):
     """验证密码"""
     return hash_password(password) == hashed
 
-def generate_token(user_id, phone, is_admin):
+def generate_token(user_id, phone, is_admin, revision=0, start_dt=None, expire_dt=None):
     """生成JWT token"""
     payload = {
         'user_id': user_id,
         'phone': phone,
         'is_admin': is_admin,
-        'exp': datetime.utcnow() + timedelta(days=7)
+        'exp': datetime.utcnow() + timedelta(days=7),
+        # 用户版本号和有效期窗口写入令牌，鉴权时不需要再读取用户数据
+        'rev': revision
     }
+    if start_dt:
+        payload['vs'] = start_dt.timestamp()
+    if expire_dt:
+        payload['ve'] = expire_dt.timestamp()
     return jwt.encode(payload, SECRET_KEY, algorithm='HS256')
 
+def bump_user_revision(user):
+    """管理员修改用户后增加版本号，使已签发的令牌失效"""
+    user['revision'] = user.get('revision', 0) + 1
+    return user
+
+def decode_token(token):
+    """验证令牌并返回其中的声明，无效时返回 None（验证过的令牌缓存到过期为止）"""
+    data = token_cache.get(token)
+    if data is None:
+        try:
+            data = jwt.decode(token, SECRET_KEY, algorithms=['HS256'])
+        except Exception:
+            return None
+        if not all(key in data for key in ('user_id', 'phone', 'is_admin')):
+            return None
+        token_cache.put(token, data)
+    return data
+
 def token_required(f):
     """JWT认证装饰器"""
     @wraps(f)
@@ -173,16 +255,28 @@ def token_required(f):
         if not token:
             return jsonify({'error': '缺少认证令牌'}), 401
         
-        try:
-            data = jwt.decode(token, SECRET_KEY, algorithms=['HS256'])
-            current_user = {
-                'user_id': data['user_id'],
-                'phone': data['phone'],
-                'is_admin': data['is_admin']
-            }
-        except:
+        data = decode_token(token)
+        if data is None:
             return jsonify({'error': '令牌无效'}), 401
         
+        # 用户被删除、重置密码或修改有效期后，已签发的令牌在所有接口上都失效
+        if 'rev' in data:
+            status = user_directory.token_status(data['user_id'], data['rev'])
+        else:
+            # 旧版令牌（没有版本号）只检查用户是否还存在
+            status = 'unknown' if user_directory.get_entry(data['user_id'], reload_if_missing=True) else 'revoked'
+        if status == 'revoked':
+            return jsonify({'error': '登录状态已失效，请重新登录'}), 401
+        g.token_status = status
+        current_user = {
+            'user_id': data['user_id'],
+            'phone': data['phone'],
+            'is_admin': data['is_admin']
+        }
+        
+        # 保存完整的声明，access_required 使用其中的有效期窗口
+        g.token_claims = data
+        
         return f(current_user, *args, **kwargs)
     
     return decorated
@@ -197,6 +291,26 @@ def admin_required(f):
     
     return decorated
 
+def access_required(f):
+    """账号有效期检查装饰器（放在 token_required 之后）"""
+    @wraps(f)
+    def decorated(current_user, *args, **kwargs):
+        # 令牌是否已吊销由 token_required 检查
+        if g.get('token_status') == 'current':
+            # 令牌仍是最新版本，直接用令牌里签名的有效期判断
+            access_check = check_claims_window(g.token_claims)
+            if not access_check['access']:
+                return jsonify({'error': access_check['message']}), 401
+            return f(current_user, *args, **kwargs)
+        
+        # 旧版令牌（没有版本号）或本进程的用户目录尚未同步，按用户数据检查
+        access_check = user_directory.check_access(current_user['user_id'])
+        if access_check and not access_check['access']:
+            return jsonify({'error': access_check['message']}), 401
+        return f(current_user, *args, **kwargs)
+    
+    return decorated
+
 def init_default_admin():
     """初始化默认管理员"""
     users = load_users()
@@ -215,34 +329,129 @@ def init_default_admin():
         save_users(users)
         print("默认管理员已创建: 17610788168 / administrator")
 
+@app.before_request
+def start_request_timer():
+    g.metrics_started = time.perf_counter()
+    g.metrics_io_seconds = 0.0
+
+@app.after_request
+def record_request_metrics(response):
+    """按路由记录请求耗时、其中 JSON 文件读写的时间和状态码"""
+    started = g.get('metrics_started')
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        metrics.observe_request(request.method, route, response.status_code,
+                                time.perf_counter() - started, g.get('metrics_io_seconds', 0.0))
+    return response
+
+def collect_app_metrics():
+    """/metrics 输出时读取的当前状态"""
+    stats = token_cache.stats()
+    return [
+        ('radio_exam_questions', 'gauge', '当前题库的题目数', [((), len(question_bank.snapshot()))]),
+        ('radio_exam_users', 'gauge', '用户数', [((), len(user_directory))]),
+        ('radio_exam_token_cache_hits_total', 'counter', '令牌缓存命中次数', [((), stats['hits'])]),
+        ('radio_exam_token_cache_misses_total', 'counter', '令牌缓存未命中次数', [((), stats['misses'])]),
+        ('radio_exam_token_cache_size', 'gauge', '令牌缓存条目数', [((), stats['size'])]),
+    ]
+
+metrics.registry.add_collector(collect_app_metrics)
+metrics.configure(METRICS_DIR, METRICS_FLUSH_INTERVAL)
+
 @app.route('/api/questions', methods=['GET'])
 @token_required
+@access_required
 def get_all_questions(current_user):
-    """获取所有题目"""
-    # 检查用户访问权限
-    users = load_users()
-    user = users.get(current_user['user_id'])
-    if user:
-        access_check = check_user_access(user)
-        if not access_check['access']:
-            return jsonify({'error': access_check['message']}), 401
-    
-    questions = load_questions()
-    return jsonify(questions)
+    """获取题目
+
+    不带参数时返回全部题目（预压缩，支持 ETag / If-None-Match）；
+    带 limit/cursor/prefix/fields 参数时按游标分页返回：
+    - limit: 每页数量（默认 50，最多 200）
+    - cursor: 上一页返回的 next_cursor（下一页第一道题的题号）
+    - prefix: 题号前缀过滤，如 MC1 或 MC1,MC3
+    - fields: 只返回指定字段，如 id,question
+    """
+    bank = question_bank.snapshot()
+    if not any(key in request.args for key in ('limit', 'cursor', 'prefix', 'fields')):
+        return send_precompressed(bank.questions_body)
+
+    try:
+        limit = int(request.args.get('limit', QUESTION_PAGE_SIZE))
+    except ValueError:
+        return jsonify({'error': 'limit 参数必须是整数'}), 400
+    limit = max(1, min(limit, QUESTION_PAGE_SIZE_MAX))
+
+    prefixes = [p.strip().upper() for p in request.args.get('prefix', '').split(',') if p.strip()]
+    fields = [f.strip() for f in request.args.get('fields', '').split(',') if f.strip()]
+    ordinals = bank.ordinals_for(prefixes)
+
+    # 游标是下一页第一道题的题号，在按序号排列的列表中二分定位
+    start = 0
+    cursor = request.args.get('cursor')
+    if cursor:
+        ordinal = bank.index_of(cursor)
+        if ordinal is None:
+            return jsonify({'error': '游标无效，请从第一页重新获取'}), 400
+        start = bisect.bisect_left(ordinals, ordinal)
+
+    page = ordinals[start:start + limit]
+    next_cursor = bank.questions[ordinals[start + limit]]['id'] if start + limit < len(ordinals) else None
+    tail = {'next_cursor': next_cursor, 'total': len(ordinals), 'version': bank.version}
+
+    def generate():
+        # 逐题输出，不在内存中拼接整页
+        yield b'{"items":['
+        for n, i in enumerate(page):
+            if n:
+                yield b','
+            if fields:
+                question = bank.questions[i]
+                yield encode_json({f: question[f] for f in fields if f in question})
+            else:
+                yield bank.fragments[i]
+        yield b'],' + encode_json(tail)[1:]
+
+    return Response(generate(), mimetype='application/json')
+
+
+@app.route('/api/questions/search', methods=['GET'])
+@token_required
+@access_required
+def search_questions(current_user):
+    """按关键词搜索题干和选项，返回按相关度排序的题目和高亮后的文本"""
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'error': '请输入搜索关键词'}), 400
+    try:
+        limit = int(request.args.get('limit', 20))
+    except ValueError:
+        return jsonify({'error': 'limit 参数必须是整数'}), 400
+    limit = max(1, min(limit, 100))
+
+    bank = question_bank.snapshot()
+    total, hits = bank.search_index.search(query, limit)
+    items = []
+    for ordinal, score, terms in hits:
+        question = bank.questions[ordinal]
+        items.append({
+            'question': question,
+            'score': round(score, 3),
+            'highlight': {
+                'question': highlight(question.get('question', ''), terms),
+                'options': {option['key']: highlight(option.get('text', ''), terms)
+                            for option in question.get('options', [])}
+            }
+        })
+    return jsonify({'query': query, 'total': total, 'items': items, 'version': bank.version})
 
 
 # 新增：获取指定范围的试卷
 @app.route('/api/exam/custom', methods=['GET'])
 @token_required
+@access_required
 def get_custom_exam(current_user):
-    # 检查用户访问权限
-    users = load_users()
-    user = users.get(current_user['user_id'])
-    if user:
-        access_check = check_user_access(user)
-        if not access_check['access']:
-            return jsonify({'error': access_check['message']}), 401
-    questions = load_questions()
+    bank = question_bank.snapshot()
+    questions = bank.questions
     
     if not questions:
         return jsonify({"error": "题库为空"}), 400
@@ -251,6 +460,14 @@ def get_custom_exam(current_user):
     start_id = request.args.get('start_id', type=int, default=1)
     count = request.args.get('count', type=int, default=20)
     
+    # 也可以直接指定起始题目ID（如 MC1-0003）
+    start_qid = request.args.get('start_qid')
+    if start_qid:
+        ordinal = bank.index_of(start_qid)
+        if ordinal is None:
+            return jsonify({"error": "起始题目不存在"}), 400
+        start_id = ordinal + 1
+    
     # 参数验证
     if start_id < 1:
         return jsonify({"error": "起始题号必须大于0"}), 400
@@ -265,87 +482,101 @@ def get_custom_exam(current_user):
     
     
     exam = {
-        "exam_id": f"custom_exam_{datetime.now().strftime('%Y%m%d%H%M%S')}",
-        "questions": selected_questions,
         "start_id": start_id,
         "actual_count": len(selected_questions)
     }
     
-    return jsonify(exam)
+    session = exam_sessions.create(current_user['user_id'], 'custom', selected_questions, bank)
+    exam['exam_id'] = session['exam_id']
+    exam['expires_at'] = session['expires_at']
+    return exam_response(exam, selected_questions, bank)
 
 @app.route('/api/exam', methods=['GET'])
 @token_required
+@access_required
 def generate_exam(current_user):
-    """生成试卷（随机20题）"""
-    # 检查用户访问权限
-    users = load_users()
-    user = users.get(current_user['user_id'])
-    if user:
-        access_check = check_user_access(user)
-        if not access_check['access']:
-            return jsonify({'error': access_check['message']}), 401
-    
-    questions = load_questions()
-    
-    # 随机选择20题
-    if len(questions) > 20:
-        exam_questions = random.sample(questions, 20)
-    else:
-        exam_questions = questions
-    return jsonify({
-        'exam_id': datetime.now().strftime('%Y%m%d%H%M%S'),
-        'questions': exam_questions
-    })
+    """生成试卷，blueprint 参数指定组卷方案（默认随机20题）"""
+    key = request.args.get('blueprint', DEFAULT_EXAM_BLUEPRINT)
+    blueprint = exam_blueprints.blueprints.get(key)
+    if blueprint is None:
+        return jsonify({'error': f'组卷方案不存在: {key}'}), 400
+
+    bank = question_bank.snapshot()
+    exam_questions = exam_blueprints.draw_exam(bank, key, blueprint)
+    session = exam_sessions.create(current_user['user_id'], 'exam', exam_questions, bank)
+    return exam_response({
+        'exam_id': session['exam_id'],
+        'blueprint': key,
+        'expires_at': session['expires_at']
+    }, exam_questions, bank)
+
+@app.route('/api/exam/blueprints', methods=['GET'])
+@token_required
+def get_exam_blueprints(current_user):
+    """获取可用的组卷方案"""
+    return jsonify([{
+        'key': key,
+        'name': blueprint.get('name', key),
+        'count': sum(quota['count'] for quota in blueprint['quotas'])
+    } for key, blueprint in exam_blueprints.blueprints.items()])
 
 @app.route('/api/exam/submit', methods=['POST'])
 @token_required
+@access_required
 def submit_exam(current_user):
-    """提交试卷"""
-    # 检查用户访问权限
-    users = load_users()
-    user = users.get(current_user['user_id'])
-    if user:
-        access_check = check_user_access(user)
-        if not access_check['access']:
-            return jsonify({'error': access_check['message']}), 401
+    """提交试卷：按考试会话中发出的题目判分，未作答的题目按答错计分"""
     data = request.json
     exam_id = data.get('exam_id')
     answers = data.get('answers', {})
     
-    questions = load_questions()
+    session = exam_sessions.get(exam_id, current_user['user_id'])
+    if session is None:
+        return jsonify({'error': '考试不存在或已过期，请重新开始考试'}), 404
+    if session['submitted']:
+        return jsonify({'error': '试卷已提交'}), 409
+    
+    bank = question_bank.snapshot()
     wrong_questions = load_wrong_questions(current_user['user_id'])
     
     results = []
     correct_count = 0
     wrong_questions_list = []
     correct_questions_list = []
-    
-    for q_id, user_answer in answers.items():
-        question = next((q for q in questions if q['id'] == q_id), None)
-        if question:
-            is_correct = is_answer_correct(user_answer, question.get('correct', ''))
-            
-            results.append({
+    changed_wrong_questions = {}
+    added_count = 0
+    stat_deltas = {}
+    
+    for q_id, correct_mask in zip(session['question_ids'], session['correct_masks']):
+        # 题库更新后已删除的题目仍按发卷时的答案判分
+        question = bank.get(q_id) or {'id': q_id, 'correct': mask_to_answer(correct_mask)}
+        answered = q_id in answers
+        user_answer = answers.get(q_id, '')
+        is_correct = check_mask(correct_mask, user_answer, question.get('correct', ''))
+        if answered:
+            question_stats.record_answer(stat_deltas, q_id, is_correct, first_try=q_id not in wrong_questions)
+        
+        results.append({
+            'question_id': q_id,
+            'user_answer': user_answer,
+            'correct_answer': question.get('correct', ''),
+            'is_correct': is_correct
+        })
+        
+        if is_correct:
+            correct_count += 1
+            # 添加到正确题目列表
+            correct_questions_list.append({
                 'question_id': q_id,
+                'question_text': question.get('question', ''),
                 'user_answer': user_answer,
-                'correct_answer': question.get('correct', ''),
-                'is_correct': is_correct
+                'correct_answer': question.get('correct', '')
             })
-            
-            if is_correct:
-                correct_count += 1
-                # 添加到正确题目列表
-                correct_questions_list.append({
-                    'question_id': q_id,
-                    'question_text': question.get('question', ''),
-                    'user_answer': user_answer,
-                    'correct_answer': question.get('correct', '')
-                })
-            else:
-                # 添加到当前用户的错题本
+        else:
+            # 作答了的题目添加到当前用户的错题本
+            if answered and bank.get(q_id):
                 if q_id not in wrong_questions:
+                    added_count += 1
                     wrong_questions[q_id] = {
-                        'question': question,
                         'wrong_count': 1,
                         'correct_count': 0,
                         'last_wrong_time': datetime.now().isoformat()
@@ -353,88 +584,129 @@ def submit_exam(current_user):
                 else:
                     wrong_questions[q_id]['wrong_count'] += 1
                     wrong_questions[q_id]['last_wrong_time'] = datetime.now().isoformat()
-                
-                # 添加到本次考试的错题列表
-                wrong_questions_list.append({
-                    'question_id': q_id,
-                    'question_text': question.get('question', ''),
-                    'user_answer': user_answer,
-                    'correct_answer': question.get('correct', '')
-                })
+                schedule_wrong(wrong_questions[q_id])
+                changed_wrong_questions[q_id] = wrong_question_ref(q_id, wrong_questions[q_id], bank)
+            
+            # 添加到本次考试的错题列表
+            wrong_questions_list.append({
+                'question_id': q_id,
+                'question_text': question.get('question', ''),
+                'user_answer': user_answer,
+                'correct_answer': question.get('correct', '')
+            })
     
-    save_wrong_questions(wrong_questions, current_user['user_id'])
+    # 先在存储中把会话标记为已交卷，同时到达的重复提交（可能在其他 worker 上）不会再次计入错题本
+    if not exam_sessions.mark_submitted(session, answers):
+        return jsonify({'error': '试卷已提交'}), 409
+    update_wrong_questions(current_user['user_id'], changed_wrong_questions, added=added_count)
+    save_question_stats(stat_deltas)
     
+    total = len(session['question_ids'])
     return jsonify({
         'exam_id': exam_id,
-        'total': len(answers),
+        'total': total,
         'correct_count': correct_count,
-        'score': int(correct_count / len(answers) * 100) if answers else 0,
+        'score': int(correct_count / total * 100) if total else 0,
         'wrong_questions': wrong_questions_list,
         'correct_questions': correct_questions_list,
         'results': results
     })
 
+@app.route('/api/exam/session/<exam_id>', methods=['GET'])
+@token_required
+@access_required
+def resume_exam(current_user, exam_id):
+    """恢复未完成的考试：返回发出的题目和已保存的答题进度"""
+    session = exam_sessions.get(exam_id, current_user['user_id'])
+    if session is None:
+        return jsonify({'error': '考试不存在或已过期'}), 404
+    
+    bank = question_bank.snapshot()
+    questions = [bank.get(q_id) for q_id in session['question_ids'] if bank.get(q_id)]
+    return exam_response({
+        'exam_id': session['exam_id'],
+        'type': session['type'],
+        'started_at': session['started_at'],
+        'expires_at': session['expires_at'],
+        'submitted': session['submitted'],
+        'answers': session['answers']
+    }, questions, bank)
+
+@app.route('/api/exam/session/<exam_id>/answers', methods=['PUT'])
+@token_required
+@access_required
+def save_exam_progress(current_user, exam_id):
+    """保存答题进度，中断后可以通过 /api/exam/session/<exam_id> 继续"""
+    session = exam_sessions.get(exam_id, current_user['user_id'])
+    if session is None:
+        return jsonify({'error': '考试不存在或已过期'}), 404
+    if session['submitted']:
+        return jsonify({'error': '试卷已提交'}), 409
+    
+    answers = (request.json or {}).get('answers', {})
+    if not isinstance(answers, dict):
+        return jsonify({'error': 'answers 必须是对象'}), 400
+    if not exam_sessions.save_answers(session, answers):
+        return jsonify({'error': '试卷已提交'}), 409
+    return jsonify({'success': True, 'saved': len(session['answers'])})
+
 @app.route('/api/wrong-questions', methods=['GET'])
 @token_required
+@access_required
 def get_wrong_questions(current_user):
     """获取错题本"""
-    # 检查用户访问权限
-    users = load_users()
-    user = users.get(current_user['user_id'])
-    if user:
-        access_check = check_user_access(user)
-        if not access_check['access']:
-            return jsonify({'error': access_check['message']}), 401
     wrong_questions = load_wrong_questions(current_user['user_id'])
     
     # 转换为列表格式
+    bank = question_bank.snapshot()
     wrong_list = []
     for q_id, wrong_info in wrong_questions.items():
+        question = hydrate_wrong_question(q_id, wrong_info, bank)
+        if not question:
+            # 题库中已删除且没有保存副本的题目无法显示
+            continue
         wrong_list.append({
             'question_id': q_id,
-            'question': wrong_info['question'],
+            'question': question,
             'wrong_count': wrong_info['wrong_count'],
             'correct_count': wrong_info['correct_count'],
-            'last_wrong_time': wrong_info['last_wrong_time']
+            'last_wrong_time': wrong_info['last_wrong_time'],
+            'due': wrong_info.get('due'),
+            'interval': wrong_info.get('interval', 0)
         })
     
     return jsonify(wrong_list)
 
 @app.route('/api/wrong-questions/practice', methods=['POST'])
 @token_required
+@access_required
 def practice_wrong_question(current_user):
     """练习错题"""
-    # 检查用户访问权限
-    users = load_users()
-    user = users.get(current_user['user_id'])
-    if user:
-        access_check = check_user_access(user)
-        if not access_check['access']:
-            return jsonify({'error': access_check['message']}), 401
     data = request.json
     q_id = data.get('question_id')
     is_correct = data.get('is_correct')
     
-    wrong_questions = load_wrong_questions(current_user['user_id'])
+    # 只读取和写入这一道题的错题记录
+    wrong_info = load_wrong_question(current_user['user_id'], q_id) if q_id else None
     
-    if q_id in wrong_questions:
+    if wrong_info:
         if is_correct:
-            wrong_questions[q_id]['correct_count'] += 1
+            wrong_info['correct_count'] += 1
+            schedule_correct(wrong_info)
             # 连续做对3次，从错题本移除
-            if wrong_questions[q_id]['correct_count'] >= 3:
-                del wrong_questions[q_id]
-                save_wrong_questions(wrong_questions, current_user['user_id'])
+            if wrong_info['correct_count'] >= 3:
+                update_wrong_questions(current_user['user_id'], {q_id: None})
                 return jsonify({
                     'success': True,
                     'removed': True,
                     'message': '题目已从错题本移除'
                 })
         else:
-            wrong_questions[q_id]['correct_count'] = 0
-            wrong_questions[q_id]['wrong_count'] += 1
-            wrong_questions[q_id]['last_wrong_time'] = datetime.now().isoformat()
-    
-    save_wrong_questions(wrong_questions, current_user['user_id'])
+            wrong_info['correct_count'] = 0
+            wrong_info['wrong_count'] += 1
+            wrong_info['last_wrong_time'] = datetime.now().isoformat()
+            schedule_wrong(wrong_info)
+        update_wrong_questions(current_user['user_id'], {q_id: wrong_question_ref(q_id, wrong_info)})
     
     return jsonify({
         'success': True,
@@ -444,63 +716,75 @@ def practice_wrong_question(current_user):
 
 @app.route('/api/wrong-questions/practice-exam', methods=['GET'])
 @token_required
+@access_required
 def generate_practice_exam(current_user):
-    """生成错题练习试卷"""
-    # 检查用户访问权限
-    users = load_users()
-    user = users.get(current_user['user_id'])
-    if user:
-        access_check = check_user_access(user)
-        if not access_check['access']:
-            return jsonify({'error': access_check['message']}), 401
-    wrong_questions = load_wrong_questions(current_user['user_id'])
+    """生成错题练习试卷（最该复习的20题）"""
+    # 从复习队列中按复习时间取题，多取几道以防有题目已从题库删除
+    q_ids = review_queues.most_due(current_user['user_id'], 25)
     
-    if not wrong_questions:
+    if not q_ids:
         return jsonify({
             'error': '暂无错题可练习'
         }), 404
     
-    # 从错题本中选择题目（最多20题）
+    bank = question_bank.snapshot()
     practice_questions = []
-    for q_id, wrong_info in wrong_questions.items():
-        practice_questions.append(wrong_info['question'])
+    for q_id in q_ids:
+        question = bank.get(q_id)
+        if not question:
+            # 题库中已删除的题目使用错题本中保存的副本
+            wrong_info = load_wrong_question(current_user['user_id'], q_id)
+            question = wrong_info and wrong_info.get('question')
+            if not question:
+                continue
+        practice_questions.append(question)
         
         if len(practice_questions) >= 20:
             break
     
-    return jsonify({
-        'exam_id': datetime.now().strftime('%Y%m%d%H%M%S'),
-        'questions': practice_questions,
-        'type': 'practice'
-    })
+    session = exam_sessions.create(current_user['user_id'], 'practice', practice_questions, bank)
+    return exam_response({
+        'exam_id': session['exam_id'],
+        'type': 'practice',
+        'expires_at': session['expires_at']
+    }, practice_questions, bank)
 
 @app.route('/api/wrong-questions/practice-submit', methods=['POST'])
 @token_required
+@access_required
 def submit_practice_exam(current_user):
     """提交错题练习"""
-    # 检查用户访问权限
-    users = load_users()
-    user = users.get(current_user['user_id'])
-    if user:
-        access_check = check_user_access(user)
-        if not access_check['access']:
-            return jsonify({'error': access_check['message']}), 401
     data = request.json
     exam_id = data.get('exam_id')
     answers = data.get('answers', {})
     
+    # 通过练习试卷发出的题目只接受本场练习中的题号；直接练习错题本时只判错题本中的题
+    session = exam_sessions.get(exam_id, current_user['user_id'])
+    if session is not None:
+        if session['submitted']:
+            return jsonify({'error': '练习已提交'}), 409
+        issued = set(session['question_ids'])
+        answers = {q_id: answer for q_id, answer in answers.items() if q_id in issued}
+    
     wrong_questions = load_wrong_questions(current_user['user_id'])
+    bank = question_bank.snapshot()
     
     results = []
     correct_count = 0
     updated_questions = []
     wrong_questions_list = []
     correct_questions_list = []
+    changed_wrong_questions = {}
+    stat_deltas = {}
     
     for q_id, user_answer in answers.items():
         if q_id in wrong_questions:
-            question = wrong_questions[q_id]['question']
-            is_correct = is_answer_correct(user_answer, question.get('correct', ''))
+            question = hydrate_wrong_question(q_id, wrong_questions[q_id], bank)
+            if not question:
+                continue
+            is_correct = check_answer(bank, question, user_answer)
+            # 错题本中的题目都不是首次作答
+            question_stats.record_answer(stat_deltas, q_id, is_correct, first_try=False)
             
             results.append({
                 'question_id': q_id,
@@ -512,6 +796,7 @@ def submit_practice_exam(current_user):
             if is_correct:
                 correct_count += 1
                 wrong_questions[q_id]['correct_count'] += 1
+                schedule_correct(wrong_questions[q_id])
                 # 添加到正确题目列表
                 correct_questions_list.append({
                     'question_id': q_id,
@@ -527,7 +812,9 @@ def submit_practice_exam(current_user):
                         'action': 'removed'
                     })
                     del wrong_questions[q_id]
+                    changed_wrong_questions[q_id] = None
                 else:
+                    changed_wrong_questions[q_id] = wrong_question_ref(q_id, wrong_questions[q_id], bank)
                     updated_questions.append({
                         'question_id': q_id,
                         'action': 'correct',
@@ -537,6 +824,8 @@ def submit_practice_exam(current_user):
                 wrong_questions[q_id]['correct_count'] = 0
                 wrong_questions[q_id]['wrong_count'] += 1
                 wrong_questions[q_id]['last_wrong_time'] = datetime.now().isoformat()
+                schedule_wrong(wrong_questions[q_id])
+                changed_wrong_questions[q_id] = wrong_question_ref(q_id, wrong_questions[q_id], bank)
                 
                 # 添加到错题列表
                 wrong_questions_list.append({
@@ -552,7 +841,10 @@ def submit_practice_exam(current_user):
                     'wrong_count': wrong_questions[q_id]['wrong_count']
                 })
     
-    save_wrong_questions(wrong_questions, current_user['user_id'])
+    if session is not None and not exam_sessions.mark_submitted(session, answers):
+        return jsonify({'error': '练习已提交'}), 409
+    update_wrong_questions(current_user['user_id'], changed_wrong_questions)
+    save_question_stats(stat_deltas)
     
     return jsonify({
         'exam_id': exam_id,
@@ -567,27 +859,64 @@ def submit_practice_exam(current_user):
 
 @app.route('/api/system/status', methods=['GET'])
 def get_system_status():
-    """获取系统状态"""
-    questions = load_questions()
-    all_wrong_questions = load_wrong_questions()  # 获取所有用户的错题数据
-    
-    # 计算总的错题数量（所有用户的错题总数）
-    total_wrong_count = 0
-    user_wrong_counts = {}
-    
-    for user_id, user_wrong_questions in all_wrong_questions.items():
-        user_wrong_count = len(user_wrong_questions)
-        total_wrong_count += user_wrong_count
-        user_wrong_counts[user_id] = user_wrong_count
+    """获取系统状态（由内存计数器提供，不读取数据文件）"""
+    total_wrong_count, user_wrong_counts = wrong_book_counters.snapshot()
     
     return jsonify({
-        'total_questions': len(questions),
+        'total_questions': len(question_bank.snapshot()),
         'wrong_questions_count': total_wrong_count,
         'user_wrong_counts': user_wrong_counts,
         'total_users_with_wrong_questions': len(user_wrong_counts),
         'last_updated': datetime.now().isoformat()
     })
 
+@app.route('/api/stats/questions', methods=['GET'])
+@token_required
+@admin_required
+def get_question_stats(current_user):
+    """题目难度统计（管理员）
+
+    - sort: error_rate（默认）、first_try_error_rate、attempts、correct_rate
+    - order: desc（默认）或 asc
+    - limit: 返回数量（默认 50）
+    - min_attempts: 至少被作答多少次的题目才参与排序（默认 1）
+    """
+    sort = request.args.get('sort', 'error_rate')
+    if sort not in question_stats.SORT_KEYS:
+        return jsonify({'error': f"sort 只能是 {', '.join(question_stats.SORT_KEYS)}"}), 400
+    try:
+        limit = max(1, int(request.args.get('limit', 50)))
+        min_attempts = int(request.args.get('min_attempts', 1))
+    except ValueError:
+        return jsonify({'error': 'limit 和 min_attempts 必须是整数'}), 400
+
+    counters = store.load_counters(question_stats.COUNTER_PREFIX)
+    rows = [row for row in question_stats.question_rows(counters, question_bank.snapshot())
+            if row['attempts'] >= min_attempts]
+    rows = question_stats.sort_rows(rows, sort, descending=request.args.get('order', 'desc') != 'asc')
+    return jsonify({
+        'total': len(rows),
+        'sort': sort,
+        'items': rows[:limit]
+    })
+
+@app.route('/api/health', methods=['GET'])
+def health_check():
+    """健康检查（供 nginx / 监控使用，不读取任何数据文件）"""
+    bank = question_bank.snapshot()
+    return jsonify({
+        'status': 'ok' if len(bank) else 'degraded',
+        'questions': len(bank),
+        'bank_version': bank.version[:12],
+        'token_cache': token_cache.stats(),
+        'pid': os.getpid()
+    })
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Prometheus 指标（nginx 只转发 /radio/api/，不对外公开）"""
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
 @app.route('/api/system/reset', methods=['POST'])
 def reset_system():
     """重置系统（清空所有用户的错题本）"""
@@ -599,8 +928,7 @@ def reset_system():
 def reset_user_wrong_questions(current_user, user_id):
     """清空指定用户的错题本（仅管理员）"""
     # 检查当前用户是否为管理员
-    users = load_users()
-    current_user_data = users.get(current_user['user_id'])
+    current_user_data = user_directory.get(current_user['user_id'])
     if not current_user_data or not current_user_data.get('is_admin', False):
         return jsonify({'error': '权限不足，仅管理员可执行此操作'}), 403
     
@@ -619,14 +947,8 @@ def login():
     if not phone or not password:
         return jsonify({'error': '手机号和密码不能为空'}), 400
     
-    users = load_users()
-    
-    # 查找用户
-    user = None
-    for user_id, user_data in users.items():
-        if user_data['phone'] == phone and user_data['status'] == 'active':
-            user = user_data
-            break
+    # 通过手机号索引查找用户
+    user = user_directory.find_by_phone(phone, active_only=True)
     
     if not user:
         return jsonify({'error': '用户不存在或已被禁用'}), 401
@@ -635,12 +957,14 @@ def login():
         return jsonify({'error': '密码错误'}), 401
     
     # 检查用户访问权限
-    access_check = check_user_access(user)
+    entry = user_directory.get_entry(user['user_id'])
+    access_check = entry.check_access()
     if not access_check['access']:
         return jsonify({'error': access_check['message']}), 401
     
     # 生成token
-    token = generate_token(user['user_id'], user['phone'], user['is_admin'])
+    token = generate_token(user['user_id'], user['phone'], user['is_admin'],
+                           entry.revision, entry.start_dt, entry.expire_dt)
     
     # 构建返回的用户信息
     user_info = {
@@ -675,15 +999,12 @@ def register(current_user):
     if not phone:
         return jsonify({'error': '手机号不能为空'}), 400
     
-    users = load_users()
-    
     # 检查手机号是否已存在
-    for user_data in users.values():
-        if user_data['phone'] == phone:
-            return jsonify({'error': '该手机号已被注册'}), 400
+    if user_directory.find_by_phone(phone):
+        return jsonify({'error': '该手机号已被注册'}), 400
     
     # 生成用户ID
-    user_id = f"user_{datetime.now().strftime('%Y%m%d%H%M%S')}"
+    user_id = allocate_user_id()
     
     # 创建新用户
     new_user = {
@@ -701,8 +1022,7 @@ def register(current_user):
     if expire_time:
         new_user['expire_time'] = expire_time
     
-    users[user_id] = new_user
-    save_users(users)
+    save_user(new_user)
     
     return jsonify({
         'success': True,
@@ -717,15 +1037,99 @@ def register(current_user):
         }
     })
 
+@app.route('/api/auth/users/bulk', methods=['POST'])
+@token_required
+@admin_required
+def bulk_register(current_user):
+    """管理员批量添加用户
+
+    上传 CSV 文件（表单字段 file）、提交 text/csv 正文或 JSON 用户列表，
+    start_time/expire_time 参数作为没有填写时间的行的默认值，dry_run=1 时只校验不写入。
+    所有新用户一次写入，返回每一行的结果。
+    """
+    data = None
+    try:
+        upload = request.files.get('file')
+        if upload is not None:
+            rows = user_provisioning.parse_csv(upload.read().decode('utf-8-sig'))
+        elif request.mimetype in ('text/csv', 'text/plain'):
+            rows = user_provisioning.parse_csv(request.get_data().decode('utf-8-sig'))
+        else:
+            data = request.get_json(silent=True)
+            rows = user_provisioning.parse_json_rows(data)
+    except UnicodeDecodeError:
+        return jsonify({'error': 'CSV 文件必须是 UTF-8 编码'}), 400
+    
+    if rows is None:
+        return jsonify({'error': '请上传 CSV 文件或提交 JSON 用户列表'}), 400
+    if not rows:
+        return jsonify({'error': '没有要添加的用户'}), 400
+    if len(rows) > BULK_USER_MAX:
+        return jsonify({'error': f'每次最多添加 {BULK_USER_MAX} 个用户'}), 400
+    
+    options = data if isinstance(data, dict) else request.values
+    defaults = {
+        'start_time': options.get('start_time'),
+        'expire_time': options.get('expire_time')
+    }
+    dry_run = str(options.get('dry_run', request.args.get('dry_run', ''))).lower() in ('1', 'true', 'yes')
+    
+    valid, results = user_provisioning.validate_rows(rows, user_directory.find_by_phone, defaults)
+    
+    new_users = []
+    if not dry_run:
+        password = hash_password('wxd666a')  # 默认密码
+        created_at = datetime.now().isoformat()
+        allocated = set()
+        for result, phone, start_time, expire_time in valid:
+            user_id = allocate_user_id(allocated)
+            allocated.add(user_id)
+            new_user = {
+                'user_id': user_id,
+                'phone': phone,
+                'password': password,
+                'is_admin': False,
+                'created_at': created_at,
+                'status': 'active'
+            }
+            if start_time:
+                new_user['start_time'] = start_time
+            if expire_time:
+                new_user['expire_time'] = expire_time
+            new_users.append(new_user)
+            result.update(status='created', user_id=user_id,
+                          start_time=start_time, expire_time=expire_time)
+        if new_users:
+            rejected = save_new_users(new_users)
+            if rejected:
+                # 校验之后其他请求添加了相同的手机号
+                for result, *_ in valid:
+                    if result.get('user_id') in rejected:
+                        for key in ('user_id', 'start_time', 'expire_time'):
+                            result.pop(key)
+                        result.update(status='error', error='该手机号已被注册')
+                new_users = [user for user in new_users if user['user_id'] not in rejected]
+    
+    return jsonify({
+        'success': True,
+        'dry_run': dry_run,
+        'created': len(new_users),
+        'valid': len(valid),
+        'failed': sum(1 for result in results if result['status'] == 'error'),
+        'password': 'wxd666a',
+        'results': results
+    })
+
 @app.route('/api/auth/users', methods=['GET'])
 @token_required
 @admin_required
 def get_users(current_user):
     """获取用户列表"""
-    users = load_users()
     user_list = []
     
-    for user_id, user_data in users.items():
+    for entry in user_directory.all_entries():
+        user_data = entry.user
+        user_id = user_data['user_id']
         user_info = {
             'user_id': user_id,
             'phone': user_data['phone'],
@@ -742,7 +1146,7 @@ def get_users(current_user):
             })
             
             # 检查访问状态
-            access_check = check_user_access(user_data)
+            access_check = entry.check_access()
             user_info['access_status'] = 'valid' if access_check['access'] else 'expired'
             user_info['days_left'] = access_check.get('days_left')
         
@@ -755,17 +1159,16 @@ def get_users(current_user):
 @admin_required
 def delete_user(current_user, user_id):
     """删除用户"""
-    users = load_users()
+    user = user_directory.get(user_id)
     
-    if user_id not in users:
+    if not user:
         return jsonify({'error': '用户不存在'}), 404
     
     # 不能删除管理员
-    if users[user_id]['is_admin']:
+    if user['is_admin']:
         return jsonify({'error': '不能删除管理员账户'}), 403
     
-    del users[user_id]
-    save_users(users)
+    delete_user_record(user_id)
     
     return jsonify({'success': True, 'message': '用户删除成功'})
 
@@ -774,14 +1177,14 @@ def delete_user(current_user, user_id):
 @admin_required
 def reset_password(current_user, user_id):
     """重置用户密码"""
-    users = load_users()
+    user = user_directory.get(user_id)
     
-    if user_id not in users:
+    if not user:
         return jsonify({'error': '用户不存在'}), 404
     
     # 重置为默认密码
-    users[user_id]['password'] = hash_password('wxd666a')
-    save_users(users)
+    user = bump_user_revision(dict(user, password=hash_password('wxd666a')))
+    save_user(user)
     
     return jsonify({
         'success': True,
@@ -800,19 +1203,18 @@ def change_password(current_user):
     if not old_password or not new_password:
         return jsonify({'error': '旧密码和新密码不能为空'}), 400
     
-    users = load_users()
-    user_id = current_user['user_id']
+    user = user_directory.get(current_user['user_id'])
     
-    if user_id not in users:
+    if not user:
         return jsonify({'error': '用户不存在'}), 404
     
     # 验证旧密码
-    if not verify_password(old_password, users[user_id]['password']):
+    if not verify_password(old_password, user['password']):
         return jsonify({'error': '旧密码错误'}), 401
     
     # 更新密码
-    users[user_id]['password'] = hash_password(new_password)
-    save_users(users)
+    user = dict(user, password=hash_password(new_password))
+    save_user(user)
     
     return jsonify({
         'success': True,
@@ -828,22 +1230,23 @@ def update_user_time(current_user, user_id):
     start_time = data.get('start_time')
     expire_time = data.get('expire_time')
     
-    users = load_users()
+    user = user_directory.get(user_id)
     
-    if user_id not in users:
+    if not user:
         return jsonify({'error': '用户不存在'}), 404
     
     # 不能修改管理员的时间限制
-    if users[user_id]['is_admin']:
+    if user['is_admin']:
         return jsonify({'error': '不能修改管理员账户的时间限制'}), 403
     
     # 更新时间限制
+    user = bump_user_revision(dict(user))
     if start_time is not None:
-        users[user_id]['start_time'] = start_time
+        user['start_time'] = start_time
     if expire_time is not None:
-        users[user_id]['expire_time'] = expire_time
+        user['expire_time'] = expire_time
     
-    save_users(users)
+    save_user(user)
     
     return jsonify({
         'success': True,
@@ -859,15 +1262,11 @@ def update_user_time(current_user, user_id):
 @token_required
 def check_user_access_info(current_user):
     """检查用户访问权限信息"""
-    users = load_users()
-    user_id = current_user['user_id']
+    access_check = user_directory.check_access(current_user['user_id'])
     
-    if user_id not in users:
+    if access_check is None:
         return jsonify({'error': '用户不存在'}), 404
     
-    user = users[user_id]
-    access_check = check_user_access(user)
-    
     return jsonify({
         'success': True,
         'access': access_check['access'],
@@ -889,18 +1288,23 @@ if __name__ == '__main__':
     # 初始化默认管理员
     init_default_admin()
     
-    # 初始化题目数据（如果不存在）
-    if not os.path.exists(QUESTIONS_FILE):
-        print("初始化题目数据库...")
-        questions = load_questions()
-        save_questions(questions)
-        print(f"已初始化 {len(questions)} 道题目")
+    # 预加载题库（不存在时从PDF文本初始化）
+    question_bank.reload()
+    
+    # 旧版错题文件自动迁移到分片存储，迁移失败时不启动
+    from migrate_wrong_questions_to_shards import migrate_on_startup
+    migrate_on_startup()
+    
+    # 开发服务器是单进程，清空上次运行留下的指标快照
+    if metrics.shared is not None:
+        metrics.shared.clear()
     
     print("启动业余无线电考试系统...")
     print(f"题目数量: {len(load_questions())}")
     print(f"错题数量: {len(load_wrong_questions())}")
-    print(f"用户数量: {len(load_users())}")
-    print("后端服务运行在: http://localhost:5001")
+    print(f"用户数量: {len(user_directory)}")
+    print(f"后端服务运行在: http://localhost:{PORT}")
     print("前端服务运行在: http://localhost:3001")
+    print("生产环境请使用: gunicorn -c gunicorn.conf.py wsgi:application")
     
-    app.run(debug=True, port=5001)
\ No newline at end of file
+    app.run(debug=DEBUG, port=PORT)
\ No newline at end of file
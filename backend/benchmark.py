@@ -0,0 +1,456 @@
+#!/usr/bin/env python3
+"""
+接口性能基准测试
+按预设规模生成合成数据（用户、错题本、按倍数扩充的题库），每个规模在独立的子进程中
+设置 RADIO_EXAM_DATA_DIR 指向生成的数据后加载应用，逐个接口计时，
+输出每个接口的 p50/p99 延迟和吞吐量（JSON），保存下来可以和以后的版本对比。
+
+默认使用 Flask 测试客户端（不经过网络），--http 时在本机启动多线程 HTTP 服务器并通过 HTTP 请求。
+存储后端跟随 RADIO_EXAM_STORAGE 等环境变量。
+
+用法:
+    python benchmark.py [--sizes small,medium,large] [--requests 200] [--concurrency 1]
+                        [--http] [--output results.json] [--baseline 上次的结果.json]
+    python benchmark.py generate <数据目录> [--users 2000] [--wrong 100] [--bank-scale 10]
+"""
+
+import argparse
+import http.client
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+SOURCE_QUESTIONS_FILE = os.path.join(BACKEND_DIR, 'data', 'questions.json')
+
+# 数据规模: 用户数、每个用户的错题数、题库倍数（相对于当前题库）
+SIZES = {
+    'small': {'users': 100, 'wrong_per_user': 20, 'bank_scale': 1},
+    'medium': {'users': 2000, 'wrong_per_user': 100, 'bank_scale': 1},
+    'large': {'users': 5000, 'wrong_per_user': 300, 'bank_scale': 10},
+}
+
+ADMIN_PHONE = '17610788168'
+ADMIN_PASSWORD = 'administrator'
+USER_PASSWORD = 'wxd666a'
+
+# 测试的接口
+ENDPOINTS = ('login', 'exam', 'exam_custom', 'exam_submit', 'wrong_questions',
+             'practice_exam', 'practice_submit', 'auth_users')
+
+# 参与测试的普通用户数（轮流使用，令牌在计时前获取）
+ACTIVE_USERS = 50
+
+
+# ---- 合成数据 ----
+
+def scale_questions(questions, bank_scale):
+    """把题库扩充为 bank_scale 倍，复制出的题目题号为 <原题号>-x<序号>，前缀和章节不变"""
+    scaled = list(questions)
+    for copy in range(1, bank_scale):
+        for question in questions:
+            clone = dict(question, id=f"{question['id']}-x{copy}")
+            if question.get('legacy_id'):
+                clone['legacy_id'] = f"{question['legacy_id']}-x{copy}"
+            scaled.append(clone)
+    return scaled
+
+
+def generate_dataset(data_dir, users=2000, wrong_per_user=100, bank_scale=1, seed=0):
+    """在 data_dir 中生成合成数据，返回数据规模说明"""
+    from json_store import JsonStore, read_json, write_json_atomic
+    import hashlib
+
+    rng = random.Random(seed)
+    os.makedirs(data_dir, exist_ok=True)
+
+    questions = scale_questions(read_json(SOURCE_QUESTIONS_FILE, []), bank_scale)
+    write_json_atomic(os.path.join(data_dir, 'questions.json'), questions, indent=2)
+
+    created_at = datetime(2024, 1, 1).isoformat()
+    all_users = {
+        'admin_001': {
+            'user_id': 'admin_001',
+            'phone': ADMIN_PHONE,
+            'password': hashlib.sha256(ADMIN_PASSWORD.encode()).hexdigest(),
+            'is_admin': True,
+            'created_at': created_at,
+            'status': 'active'
+        }
+    }
+    password = hashlib.sha256(USER_PASSWORD.encode()).hexdigest()
+    for i in range(users):
+        user_id = f'bench_{i:06d}'
+        all_users[user_id] = {
+            'user_id': user_id,
+            'phone': f'139{i:08d}',
+            'password': password,
+            'is_admin': False,
+            'created_at': created_at,
+            'status': 'active',
+            'start_time': '2020-01-01 00:00:00',
+            'expire_time': '2099-12-31 23:59:59'
+        }
+
+    q_ids = [q['id'] for q in questions]
+    wrong_per_user = min(wrong_per_user, len(q_ids))
+    all_wrong_questions = {}
+    for user_id in all_users:
+        if user_id == 'admin_001':
+            continue
+        wrong_questions = {}
+        for q_id in rng.sample(q_ids, wrong_per_user):
+            wrong_at = datetime(2024, 1, 1 + rng.randrange(28), rng.randrange(24)).isoformat()
+            wrong_questions[q_id] = {
+                'wrong_count': rng.randint(1, 5),
+                'correct_count': rng.randint(0, 3),
+                'last_wrong_time': wrong_at,
+                'ease': round(rng.uniform(1.3, 2.5), 2),
+                'repetitions': 0,
+                'interval': 0,
+                'due': wrong_at
+            }
+        all_wrong_questions[user_id] = wrong_questions
+
+    if os.environ.get('RADIO_EXAM_STORAGE', 'json').lower() == 'sqlite':
+        from sqlite_store import SQLiteStore
+        store = SQLiteStore(os.environ.get('RADIO_EXAM_SQLITE_PATH', os.path.join(data_dir, 'radio_exam.db')))
+    else:
+        store = JsonStore(os.path.join(data_dir, 'users.json'), os.path.join(data_dir, 'wrong_questions'))
+    store.save_users(all_users)
+    store.save_all_wrong_questions(all_wrong_questions)
+
+    return {
+        'users': users,
+        'wrong_per_user': wrong_per_user,
+        'bank_scale': bank_scale,
+        'questions': len(questions)
+    }
+
+
+# ---- 请求方式 ----
+
+class TestClientTransport:
+    """通过 Flask 测试客户端请求"""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, token=None, body=None):
+        headers = {'Authorization': 'Bearer ' + token} if token else {}
+        response = self.client.open(path, method=method, headers=headers, json=body)
+        return response.status_code, response.get_json(silent=True)
+
+
+class HttpTransport:
+    """通过 HTTP 请求本机的测试服务器（保持连接）"""
+
+    def __init__(self, port):
+        self.connection = http.client.HTTPConnection('127.0.0.1', port)
+
+    def request(self, method, path, token=None, body=None):
+        headers = {'Authorization': 'Bearer ' + token} if token else {}
+        payload = None
+        if body is not None:
+            payload = json.dumps(body).encode('utf-8')
+            headers['Content-Type'] = 'application/json'
+        self.connection.request(method, path, body=payload, headers=headers)
+        response = self.connection.getresponse()
+        raw = response.read()
+        try:
+            data = json.loads(raw) if raw else None
+        except ValueError:
+            data = None
+        return response.status, data
+
+
+# ---- 测试场景 ----
+
+def percentile(sorted_values, p):
+    """最近秩百分位数"""
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, max(0, math.ceil(p * len(sorted_values)) - 1))]
+
+
+def random_answers(rng, q_ids):
+    return {q_id: rng.choice(('A', 'B', 'C', 'D', 'AB', 'AC')) for q_id in q_ids}
+
+
+def build_scenarios(transport, admin_token, user_tokens, user_phones, rng):
+    """返回 {接口名称: (准备函数, 请求函数)}
+
+    准备函数不计时（如提交试卷前先领取试卷），返回值传给请求函数。
+    """
+    def any_user():
+        return rng.choice(user_tokens)
+
+    def issue(path):
+        token = any_user()
+        status, exam = transport.request('GET', path, token)
+        return token, exam if status == 200 else None
+
+    def submit(path):
+        def run(prepared):
+            token, exam = prepared
+            if exam is None:
+                return 0
+            answers = random_answers(rng, [q['id'] for q in exam['questions']])
+            return transport.request('POST', path, token, {'exam_id': exam['exam_id'], 'answers': answers})[0]
+        return run
+
+    def custom_path():
+        return f'/api/exam/custom?start_id={rng.randint(1, 600)}&count=50'
+
+    return {
+        'login': (lambda: rng.choice(user_phones),
+                  lambda phone: transport.request('POST', '/api/auth/login', None,
+                                                  {'phone': phone, 'password': USER_PASSWORD})[0]),
+        'exam': (any_user, lambda token: transport.request('GET', '/api/exam', token)[0]),
+        'exam_custom': (any_user, lambda token: transport.request('GET', custom_path(), token)[0]),
+        'exam_submit': (lambda: issue('/api/exam'), submit('/api/exam/submit')),
+        'wrong_questions': (any_user, lambda token: transport.request('GET', '/api/wrong-questions', token)[0]),
+        'practice_exam': (any_user,
+                          lambda token: transport.request('GET', '/api/wrong-questions/practice-exam', token)[0]),
+        'practice_submit': (lambda: issue('/api/wrong-questions/practice-exam'),
+                            submit('/api/wrong-questions/practice-submit')),
+        'auth_users': (lambda: admin_token,
+                       lambda token: transport.request('GET', '/api/auth/users', token)[0]),
+    }
+
+
+def run_scenario(make_transport, name, requests, concurrency, login, seed):
+    """用 concurrency 个线程各自发送请求，返回该接口的统计结果"""
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    per_thread = max(1, requests // concurrency)
+
+    def worker(index):
+        rng = random.Random(seed * 1000 + index)
+        transport = make_transport()
+        admin_token, user_tokens, user_phones = login(transport)
+        prepare, call = build_scenarios(transport, admin_token, user_tokens, user_phones, rng)[name]
+        local = []
+        local_errors = 0
+        for _ in range(per_thread):
+            prepared = prepare()
+            started = time.perf_counter()
+            status = call(prepared)
+            local.append(time.perf_counter() - started)
+            if not 200 <= status < 400:
+                local_errors += 1
+        with lock:
+            latencies.extend(local)
+            errors[0] += local_errors
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    busy = sum(latencies)
+    return {
+        'endpoint': name,
+        'requests': len(latencies),
+        'errors': errors[0],
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+        'mean_ms': round(busy / len(latencies) * 1000, 3),
+        # 单线程时按请求耗时之和计算（不含准备时间），多线程时按墙钟时间计算
+        'throughput_rps': round(len(latencies) / (busy if concurrency == 1 else wall), 1)
+    }
+
+
+def run_worker(data_dir, options):
+    """子进程中运行：加载指向 data_dir 的应用并测试所有接口"""
+    sys.path.insert(0, BACKEND_DIR)
+    os.chdir(data_dir)
+    import app as appmod
+
+    server = None
+    if options['http']:
+        import logging
+        from werkzeug.serving import make_server
+        logging.getLogger('werkzeug').setLevel(logging.ERROR)
+        server = make_server('127.0.0.1', 0, appmod.app, threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        port = server.server_port
+
+        def make_transport():
+            return HttpTransport(port)
+    else:
+        def make_transport():
+            return TestClientTransport(appmod.app)
+
+    user_ids = sorted(user['user_id'] for user in appmod.load_users().values() if not user['is_admin'])
+    rng = random.Random(options['seed'])
+    active = rng.sample(user_ids, min(ACTIVE_USERS, len(user_ids)))
+    user_phones = [appmod.user_directory.get(user_id)['phone'] for user_id in active]
+    tokens = {}
+
+    def login(transport):
+        # 令牌只获取一次，各线程共用
+        if not tokens:
+            def token_for(phone, password):
+                status, data = transport.request('POST', '/api/auth/login', None,
+                                                  {'phone': phone, 'password': password})
+                if status != 200:
+                    raise RuntimeError(f'登录失败: {phone} {status} {data}')
+                return data['token']
+            tokens['admin'] = token_for(ADMIN_PHONE, ADMIN_PASSWORD)
+            tokens['users'] = [token_for(phone, USER_PASSWORD) for phone in user_phones]
+        return tokens['admin'], tokens['users'], user_phones
+
+    login(make_transport())
+    # 预热（加载题库、用户目录和计数器）
+    warm = make_transport()
+    warm.request('GET', '/api/health')
+    warm.request('GET', '/api/exam', tokens['users'][0])
+
+    names = [name for name in ENDPOINTS if not options['endpoints'] or name in options['endpoints']]
+    results = []
+    for name in names:
+        results.append(run_scenario(make_transport, name, options['requests'], options['concurrency'],
+                                    login, options['seed']))
+    if server is not None:
+        server.shutdown()
+    return results
+
+
+# ---- 报告 ----
+
+def print_table(results, baseline=None):
+    previous = {}
+    for result in (baseline or {}).get('results', []):
+        previous[(result['dataset'], result['endpoint'])] = result
+
+    print(f"{'数据规模':<10}{'接口':<18}{'请求数':>8}{'错误':>6}{'p50(ms)':>10}{'p99(ms)':>10}{'吞吐(次/秒)':>14}"
+          + ('   p99 对比' if baseline else ''), file=sys.stderr)
+    for result in results:
+        line = (f"{result['dataset']:<10}{result['endpoint']:<18}{result['requests']:>8}{result['errors']:>6}"
+                f"{result['p50_ms']:>10.2f}{result['p99_ms']:>10.2f}{result['throughput_rps']:>14.1f}")
+        old = previous.get((result['dataset'], result['endpoint']))
+        if old and old.get('p99_ms'):
+            line += f"   {result['p99_ms'] / old['p99_ms']:.2f}x"
+        print(line, file=sys.stderr)
+
+
+def run_benchmarks(args):
+    sizes = [size.strip() for size in args.sizes.split(',') if size.strip()]
+    for size in sizes:
+        if size not in SIZES:
+            print(f"未知的数据规模: {size}（可选: {', '.join(SIZES)}）", file=sys.stderr)
+            sys.exit(1)
+
+    options = {
+        'requests': args.requests,
+        'concurrency': args.concurrency,
+        'http': args.http,
+        'seed': args.seed,
+        'endpoints': [name.strip() for name in args.endpoints.split(',')] if args.endpoints else None
+    }
+
+    results = []
+    datasets = {}
+    for size in sizes:
+        work_dir = tempfile.mkdtemp(prefix=f'radio_exam_bench_{size}_')
+        data_dir = os.path.join(work_dir, 'data')
+        try:
+            print(f"生成 {size} 数据集...", file=sys.stderr)
+            dataset = generate_dataset(data_dir, seed=args.seed, **SIZES[size])
+            datasets[size] = dataset
+
+            env = dict(os.environ, RADIO_EXAM_DATA_DIR=data_dir, RADIO_EXAM_DEBUG='0')
+            print(f"测试 {size} 数据集（{dataset['users']} 个用户，{dataset['questions']} 道题）...", file=sys.stderr)
+            completed = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), '_worker', data_dir, json.dumps(options)],
+                env=env, cwd=work_dir, stdout=subprocess.PIPE)
+            if completed.returncode != 0:
+                print(f"{size} 数据集测试失败", file=sys.stderr)
+                sys.exit(completed.returncode)
+            for result in json.loads(completed.stdout.decode('utf-8').strip().splitlines()[-1]):
+                results.append(dict(result, dataset=size))
+        finally:
+            if not args.keep_data:
+                shutil.rmtree(work_dir, ignore_errors=True)
+            else:
+                print(f"数据保留在 {data_dir}", file=sys.stderr)
+
+    report = {
+        'generated_at': datetime.now().isoformat(),
+        'mode': 'http' if args.http else 'test_client',
+        'storage': os.environ.get('RADIO_EXAM_STORAGE', 'json'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'requests_per_endpoint': args.requests,
+        'concurrency': args.concurrency,
+        'datasets': datasets,
+        'results': results
+    }
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+    print_table(results, baseline)
+
+    encoded = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(encoded + '\n')
+        print(f"结果已保存到 {args.output}", file=sys.stderr)
+    else:
+        print(encoded)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == '_worker':
+        # 子进程：测试结果作为最后一行输出到标准输出，应用的日志转到标准错误
+        stdout = sys.stdout
+        sys.stdout = sys.stderr
+        worker_results = run_worker(sys.argv[2], json.loads(sys.argv[3]))
+        stdout.write(json.dumps(worker_results) + '\n')
+        stdout.flush()
+        sys.exit(0)
+
+    sys.path.insert(0, BACKEND_DIR)
+    if len(sys.argv) > 1 and sys.argv[1] == 'generate':
+        parser = argparse.ArgumentParser(description='生成合成数据集')
+        parser.add_argument('command')
+        parser.add_argument('data_dir')
+        parser.add_argument('--users', type=int, default=SIZES['medium']['users'])
+        parser.add_argument('--wrong', type=int, default=SIZES['medium']['wrong_per_user'], help='每个用户的错题数')
+        parser.add_argument('--bank-scale', type=int, default=1, help='题库倍数')
+        parser.add_argument('--seed', type=int, default=0)
+        args = parser.parse_args()
+        info = generate_dataset(args.data_dir, args.users, args.wrong, args.bank_scale, args.seed)
+        print(json.dumps(info, ensure_ascii=False))
+        print(f"使用方法: RADIO_EXAM_DATA_DIR={os.path.abspath(args.data_dir)} gunicorn -c gunicorn.conf.py wsgi:application",
+              file=sys.stderr)
+        sys.exit(0)
+
+    parser = argparse.ArgumentParser(description='接口性能基准测试')
+    parser.add_argument('--sizes', default='small,medium', help=f"数据规模，逗号分隔（{', '.join(SIZES)}）")
+    parser.add_argument('--requests', type=int, default=200, help='每个接口的请求数')
+    parser.add_argument('--concurrency', type=int, default=1, help='并发线程数')
+    parser.add_argument('--endpoints', help='只测试这些接口，逗号分隔')
+    parser.add_argument('--http', action='store_true', help='通过本机 HTTP 服务器请求')
+    parser.add_argument('--output', help='结果JSON文件（默认输出到标准输出）')
+    parser.add_argument('--baseline', help='上次的结果JSON，用于对比 p99')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--keep-data', action='store_true', help='保留生成的数据目录')
+    run_benchmarks(parser.parse_args())
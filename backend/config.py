@@ -0,0 +1,70 @@
+import os
+
+# 所有配置都可以通过环境变量覆盖
+
+# 数据目录
+DATA_DIR = os.environ.get('RADIO_EXAM_DATA_DIR', 'data')
+
+# 存储后端: json（默认，数据保存在 data/ 下的JSON文件）或 sqlite
+STORAGE_BACKEND = os.environ.get('RADIO_EXAM_STORAGE', 'json').lower()
+
+# SQLite数据库文件路径（STORAGE_BACKEND=sqlite 时使用）
+SQLITE_PATH = os.environ.get('RADIO_EXAM_SQLITE_PATH', os.path.join(DATA_DIR, 'radio_exam.db'))
+
+# JSON存储的写后日志（write-behind）：修改先追加到日志并 fsync，由后台线程合并进主文件
+# 内存中的数据是权威副本，只能用于单进程部署
+JSON_WRITE_BEHIND = os.environ.get('RADIO_EXAM_WRITE_BEHIND', '0').lower() in ('1', 'true', 'yes')
+JOURNAL_PATH = os.environ.get('RADIO_EXAM_JOURNAL_PATH', os.path.join(DATA_DIR, 'journal.log'))
+# 组提交窗口（毫秒）：窗口内同时到达的修改共用一次 fsync
+JOURNAL_COMMIT_WINDOW_MS = float(os.environ.get('RADIO_EXAM_JOURNAL_COMMIT_WINDOW_MS', '2'))
+# 日志压缩间隔（秒）
+JOURNAL_COMPACT_INTERVAL = float(os.environ.get('RADIO_EXAM_JOURNAL_COMPACT_INTERVAL', '5'))
+
+# 用户目录缓存检查存储版本号的间隔（秒），多 worker 部署时其他进程的修改最多延迟这么久生效
+USER_CACHE_CHECK_INTERVAL = float(os.environ.get('RADIO_EXAM_USER_CACHE_CHECK_INTERVAL', '1'))
+
+# 题目分页接口（/api/questions?limit=...）的默认每页数量和上限
+QUESTION_PAGE_SIZE = int(os.environ.get('RADIO_EXAM_QUESTION_PAGE_SIZE', '50'))
+QUESTION_PAGE_SIZE_MAX = int(os.environ.get('RADIO_EXAM_QUESTION_PAGE_SIZE_MAX', '200'))
+
+# 组卷方案：内置 default（随机20题）和 class_a（A类模拟考试），可在此JSON文件中增加或覆盖
+EXAM_BLUEPRINTS_FILE = os.environ.get('RADIO_EXAM_BLUEPRINTS_FILE', os.path.join(DATA_DIR, 'exam_blueprints.json'))
+# /api/exam 不指定 blueprint 参数时使用的方案
+DEFAULT_EXAM_BLUEPRINT = os.environ.get('RADIO_EXAM_DEFAULT_BLUEPRINT', 'default')
+
+# 错题复习队列在内存中的有效期（秒），多 worker 部署时其他进程对错题本的修改最多延迟这么久影响出题顺序
+REVIEW_QUEUE_TTL = float(os.environ.get('RADIO_EXAM_REVIEW_QUEUE_TTL', '60'))
+
+# 考试会话：有效期（秒）、内存中最多保留的会话数、是否持久化到存储后端（多 worker 部署时需要）
+EXAM_SESSION_TTL = float(os.environ.get('RADIO_EXAM_SESSION_TTL', '7200'))
+EXAM_SESSION_MAX = int(os.environ.get('RADIO_EXAM_SESSION_MAX', '10000'))
+EXAM_SESSION_PERSIST = os.environ.get('RADIO_EXAM_SESSION_PERSIST', '1').lower() in ('1', 'true', 'yes')
+# 持久化时后台清理过期会话的间隔（秒）
+EXAM_SESSION_PURGE_INTERVAL = float(os.environ.get('RADIO_EXAM_SESSION_PURGE_INTERVAL', '600'))
+
+# /api/system/status 的错题计数器重新扫描全部错题本校正的间隔（秒），0 表示不校正（单进程部署）
+STATUS_RESYNC_INTERVAL = float(os.environ.get('RADIO_EXAM_STATUS_RESYNC_INTERVAL', '300'))
+
+# JSON 存储的答题统计计数器在内存中累加，每隔这么多秒合并写入 counters.json 一次（0 表示每次交卷都写入）
+COUNTER_FLUSH_INTERVAL = float(os.environ.get('RADIO_EXAM_COUNTER_FLUSH_INTERVAL', '5'))
+
+# 多 worker 部署时各进程把 /metrics 的数据写入这个目录，由处理抓取的 worker 合并输出；
+# 每隔 METRICS_FLUSH_INTERVAL 秒写入一次（其他 worker 的数据最多延迟这么久），目录为空表示只输出本进程的数据
+METRICS_DIR = os.environ.get('RADIO_EXAM_METRICS_DIR', os.path.join(DATA_DIR, 'metrics'))
+METRICS_FLUSH_INTERVAL = float(os.environ.get('RADIO_EXAM_METRICS_FLUSH_INTERVAL', '2'))
+
+# 已验证令牌缓存的最大条目数（每个条目在令牌过期前有效），0 表示不缓存
+TOKEN_CACHE_SIZE = int(os.environ.get('RADIO_EXAM_TOKEN_CACHE_SIZE', '10000'))
+
+# 批量添加用户接口每次最多导入的行数
+BULK_USER_MAX = int(os.environ.get('RADIO_EXAM_BULK_USER_MAX', '1000'))
+
+# ---- 服务 ----
+# 开发服务器（python app.py）
+PORT = int(os.environ.get('RADIO_EXAM_PORT', '5001'))
+DEBUG = os.environ.get('RADIO_EXAM_DEBUG', '1').lower() in ('1', 'true', 'yes')
+
+# 生产服务器（gunicorn -c gunicorn.conf.py wsgi:application）
+BIND = os.environ.get('RADIO_EXAM_BIND', f'127.0.0.1:{PORT}')
+WORKERS = int(os.environ.get('RADIO_EXAM_WORKERS', str(os.cpu_count() or 1)))
+THREADS = int(os.environ.get('RADIO_EXAM_THREADS', '4'))
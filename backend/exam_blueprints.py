@@ -0,0 +1,128 @@
+import os
+import json
+import random
+import bisect
+
+from config import EXAM_BLUEPRINTS_FILE
+from json_store import read_json
+
+# 内置组卷方案
+#   quotas 中每一项从匹配的分桶里随机抽 count 道题：
+#   section 按考纲章节前缀匹配（"1" 匹配 1.x.x，"1.1" 匹配 1.1.x），type 为题号前缀（MC1/MC2/MC3/MC4），
+#   两者都不写表示整个题库
+BUILTIN_BLUEPRINTS = {
+    'default': {
+        'name': '随机组卷',
+        'quotas': [{'count': 20}]
+    },
+    # A类操作技术能力验证模拟考试：40题，各章题量按题库中各章的比例分配
+    'class_a': {
+        'name': 'A类模拟考试',
+        'quotas': [
+            {'section': '1', 'count': 13},
+            {'section': '2', 'count': 10},
+            {'section': '3', 'count': 11},
+            {'section': '4', 'count': 4},
+            {'section': '5', 'count': 2}
+        ]
+    }
+}
+
+
+def validate_blueprint(blueprint):
+    """检查组卷方案格式，格式错误抛出 ValueError"""
+    if not isinstance(blueprint, dict) or not isinstance(blueprint.get('quotas'), list) \
+            or not blueprint['quotas']:
+        raise ValueError('组卷方案必须包含非空的 quotas 列表')
+    for quota in blueprint['quotas']:
+        if not isinstance(quota, dict):
+            raise ValueError('quotas 中每一项必须是对象')
+        count = quota.get('count')
+        if not isinstance(count, int) or isinstance(count, bool) or count <= 0:
+            raise ValueError(f"题量必须是正整数: {quota}")
+        for key in ('section', 'type'):
+            if key in quota and not isinstance(quota[key], str):
+                raise ValueError(f"{key} 必须是字符串: {quota}")
+
+
+def load_blueprints(path=EXAM_BLUEPRINTS_FILE):
+    """加载组卷方案：内置方案 + 配置文件中的方案（同名时以配置文件为准）"""
+    blueprints = dict(BUILTIN_BLUEPRINTS)
+    if not path or not os.path.exists(path):
+        return blueprints
+    try:
+        custom = read_json(path, {})
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"加载组卷方案文件失败: {e}，只使用内置方案")
+        return blueprints
+    for key, blueprint in custom.items():
+        try:
+            validate_blueprint(blueprint)
+        except ValueError as e:
+            print(f"组卷方案 {key} 无效，已忽略: {e}")
+            continue
+        blueprints[key] = blueprint
+    print(f"从 {path} 加载了组卷方案: {', '.join(custom)}")
+    return blueprints
+
+
+def _section_matches(section, wanted):
+    return not wanted or section == wanted or section.startswith(wanted + '.')
+
+
+def plan_blueprint(bank, key, blueprint):
+    """把组卷方案解析为每一项对应的候选分桶，结果缓存在题库快照上
+
+    每一项为 (题量, 分桶列表, 各分桶起始位置的累计数组, 候选题目总数)
+    """
+    plan = bank.plans.get(key)
+    if plan is not None:
+        return plan
+    plan = []
+    for quota in blueprint['quotas']:
+        buckets = [ordinals for (section, prefix), ordinals in sorted(bank.buckets.items())
+                   if _section_matches(section, quota.get('section'))
+                   and (not quota.get('type') or prefix == quota['type'])]
+        offsets = []
+        total = 0
+        for ordinals in buckets:
+            offsets.append(total)
+            total += len(ordinals)
+        plan.append((quota['count'], buckets, offsets, total))
+    bank.plans[key] = plan
+    return plan
+
+
+def draw_exam(bank, key, blueprint, rng=random):
+    """按组卷方案抽题，返回题目列表
+
+    每一项在候选分桶的总长度上随机取下标再换算到分桶，抽题耗时只与题量有关；
+    题目按方案中各项的顺序排列，不同项的候选范围重叠时不会重复抽到同一道题
+    """
+    picked = set()
+    exam_questions = []
+    for count, buckets, offsets, total in plan_blueprint(bank, key, blueprint):
+        wanted = min(count, total)
+        drawn = 0
+        attempts = 0
+        while drawn < wanted and attempts < wanted * 10 + 100:
+            attempts += 1
+            k = rng.randrange(total)
+            b = bisect.bisect_right(offsets, k) - 1
+            ordinal = buckets[b][k - offsets[b]]
+            if ordinal in picked:
+                continue
+            picked.add(ordinal)
+            exam_questions.append(bank.questions[ordinal])
+            drawn += 1
+        if drawn < wanted:
+            # 候选题大多已被前面的项抽走，改为在剩余题目中抽取
+            rest = [i for ordinals in buckets for i in ordinals if i not in picked]
+            for ordinal in rng.sample(rest, min(wanted - drawn, len(rest))):
+                picked.add(ordinal)
+                exam_questions.append(bank.questions[ordinal])
+    return exam_questions
+
+
+# 进程启动时加载
+blueprints = load_blueprints()
@@ -0,0 +1,126 @@
+import os
+import copy
+import time
+import uuid
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+import grading
+
+
+class ExamSessionStore:
+    """考试会话：记录发出的题号和正确答案位掩码，交卷时按会话判分
+
+    没有 backing（存储后端）时会话保存在内存中的 LRU 缓存里，只适用于单进程部署。
+    设置了 backing 时以存储中的会话为准，每次读取都重新加载，多 worker 部署时其他进程
+    保存的进度和交卷状态立即可见；交卷和保存进度是存储中的条件写入（已交卷的会话不再修改），
+    同一份试卷不会被判分两次。过期会话由后台线程每隔 purge_interval 秒清理。
+    """
+
+    def __init__(self, backing=None, ttl=7200.0, max_sessions=10000, purge_interval=600.0):
+        self.backing = backing
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.purge_interval = purge_interval
+        self._lock = threading.Lock()
+        self._sessions = OrderedDict()
+        self._purger_pid = None
+
+    def create(self, user_id, kind, questions, bank):
+        """为发出的试卷创建会话"""
+        session = {
+            'exam_id': uuid.uuid4().hex,
+            'user_id': user_id,
+            'type': kind,
+            'question_ids': [q['id'] for q in questions],
+            'correct_masks': [self._correct_mask(q, bank) for q in questions],
+            'bank_version': bank.version,
+            'started_at': datetime.now().isoformat(),
+            'expires_at': time.time() + self.ttl,
+            'answers': {},
+            'submitted': False
+        }
+        if self.backing is not None:
+            self._ensure_purger()
+            self.backing.save_exam_session(session)
+        else:
+            self._remember(session)
+        return session
+
+    @staticmethod
+    def _correct_mask(question, bank):
+        ordinal = bank.index_of(question['id'])
+        if ordinal is not None and bank.questions[ordinal] is question:
+            return bank.correct_masks[ordinal]
+        return grading.answer_mask(question.get('correct', ''))
+
+    def _remember(self, session):
+        with self._lock:
+            self._sessions[session['exam_id']] = session
+            self._sessions.move_to_end(session['exam_id'])
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+
+    def _ensure_purger(self):
+        """在当前进程中启动清理线程（fork 之后需要重新启动）"""
+        if self._purger_pid == os.getpid() or not self.purge_interval:
+            return
+        with self._lock:
+            if self._purger_pid == os.getpid():
+                return
+            self._purger_pid = os.getpid()
+            threading.Thread(target=self._purge_loop, name='exam-session-purge', daemon=True).start()
+
+    def _purge_loop(self):
+        while True:
+            time.sleep(self.purge_interval)
+            try:
+                removed = self.backing.purge_exam_sessions(time.time())
+                if removed:
+                    print(f"已清理 {removed} 个过期的考试会话")
+            except Exception as e:
+                print(f"清理考试会话失败: {e}")
+
+    def get(self, exam_id, user_id=None):
+        """获取未过期的会话，指定 user_id 时只返回该用户的会话"""
+        if not exam_id:
+            return None
+        if self.backing is not None:
+            session = self.backing.load_exam_session(exam_id)
+        else:
+            with self._lock:
+                session = self._sessions.get(exam_id)
+                if session is not None:
+                    self._sessions.move_to_end(exam_id)
+                    session = copy.deepcopy(session)
+        if session is None or session['expires_at'] < time.time():
+            return None
+        if user_id is not None and session['user_id'] != user_id:
+            return None
+        return session
+
+    def save_answers(self, session, answers):
+        """保存答题进度（只保留本场考试中的题目），会话已交卷时返回 False"""
+        issued = set(session['question_ids'])
+        session['answers'].update({q_id: answer for q_id, answer in answers.items() if q_id in issued})
+        return self._save_if_open(session)
+
+    def mark_submitted(self, session, answers):
+        """标记为已交卷；会话已经被交过卷（如另一个 worker 同时处理了交卷请求）时返回 False"""
+        session['answers'] = {q_id: answers[q_id] for q_id in session['question_ids'] if q_id in answers}
+        session['submitted'] = True
+        session['submitted_at'] = datetime.now().isoformat()
+        return self._save_if_open(session)
+
+    def _save_if_open(self, session):
+        """只有存储中的会话尚未交卷时才写入"""
+        if self.backing is not None:
+            return self.backing.update_open_exam_session(session)
+        with self._lock:
+            current = self._sessions.get(session['exam_id'])
+            if current is not None and current['submitted']:
+                return False
+            self._sessions[session['exam_id']] = copy.deepcopy(session)
+            self._sessions.move_to_end(session['exam_id'])
+            return True
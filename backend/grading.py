@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+判分引擎
+答案按位编码（A=1, B=2, C=4, D=8），多选题 "AC" 编码为 5，判分只需比较两个整数。
+编码规则与 is_answer_correct 一致：不区分大小写和顺序，重复的字母只算一次；
+含有 A-D 以外字符的答案编码为 INVALID，按原来的字符串规则比较。
+
+命令行批量判分历史答题记录（每行一个JSON，格式与提交试卷的请求相同）:
+    python grading.py answers.jsonl [输出文件]
+"""
+
+import json
+import sys
+
+# numpy 是可选依赖，没有安装时逐条比较
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+ANSWER_BITS = {'A': 1, 'B': 2, 'C': 4, 'D': 8}
+INVALID = -1
+
+
+def normalize_answer(answer):
+    """标准化答案（排序并去重）"""
+    if not answer:
+        return ""
+    # 将答案转换为大写，排序并去重
+    return ''.join(sorted(set(str(answer).upper())))
+
+def is_answer_correct(user_answer, correct_answer):
+    """判断答案是否正确（支持多选题）"""
+    user_normalized = normalize_answer(user_answer)
+    correct_normalized = normalize_answer(correct_answer)
+    return user_normalized == correct_normalized
+
+
+def answer_mask(answer):
+    """把答案编码为位掩码，无法编码时返回 INVALID"""
+    if not answer:
+        return 0
+    mask = 0
+    for ch in str(answer).upper():
+        bit = ANSWER_BITS.get(ch)
+        if bit is None:
+            return INVALID
+        mask |= bit
+    return mask
+
+
+def mask_to_answer(mask):
+    """位掩码还原为答案字符串，如 5 -> AC"""
+    return ''.join(key for key, bit in ANSWER_BITS.items() if mask & bit) if mask != INVALID else ''
+
+
+def check_mask(correct_mask, user_answer, correct_answer=''):
+    """按预先编码的正确答案判分；无法编码时按字符串规则和 correct_answer 比较"""
+    user_mask = answer_mask(user_answer)
+    if correct_mask == INVALID or user_mask == INVALID:
+        return is_answer_correct(user_answer, correct_answer)
+    return user_mask == correct_mask
+
+
+def check_answer(bank, question, user_answer):
+    """判断一道题是否答对；题库中的题目使用预先编码的正确答案"""
+    ordinal = bank.index_of(question.get('id'))
+    if ordinal is not None and bank.questions[ordinal] is question:
+        correct_mask = bank.correct_masks[ordinal]
+    else:
+        # 不在当前题库中的题目（错题本里保存的旧副本）
+        correct_mask = answer_mask(question.get('correct', ''))
+    return check_mask(correct_mask, user_answer, question.get('correct', ''))
+
+
+def grade_batch(bank, rows):
+    """批量判分，rows 为 [(题号, 用户答案)]，返回与 rows 等长的结果列表
+
+    结果为 True/False，题号不在题库中时为 None。安装了 numpy 时整批向量化比较。
+    """
+    ordinals = []
+    user_masks = []
+    for q_id, user_answer in rows:
+        ordinal = bank.index_of(q_id)
+        ordinals.append(-1 if ordinal is None else ordinal)
+        user_masks.append(answer_mask(user_answer))
+
+    if numpy is not None and rows:
+        ordinal_array = numpy.array(ordinals, dtype=numpy.int64)
+        user_array = numpy.array(user_masks, dtype=numpy.int64)
+        known = ordinal_array >= 0
+        correct_array = bank.correct_mask_array()[numpy.where(known, ordinal_array, 0)]
+        correct = (user_array == correct_array).tolist()
+        fallback = ((user_array == INVALID) | (correct_array == INVALID)).tolist()
+        known = known.tolist()
+    else:
+        correct_masks = bank.correct_masks
+        known = [ordinal >= 0 for ordinal in ordinals]
+        correct = [known[i] and user_masks[i] == correct_masks[ordinals[i]] for i in range(len(rows))]
+        fallback = [known[i] and (user_masks[i] == INVALID or correct_masks[ordinals[i]] == INVALID)
+                    for i in range(len(rows))]
+
+    results = []
+    for i, (q_id, user_answer) in enumerate(rows):
+        if not known[i]:
+            results.append(None)
+        elif fallback[i]:
+            results.append(is_answer_correct(user_answer, bank.questions[ordinals[i]].get('correct', '')))
+        else:
+            results.append(bool(correct[i]))
+    return results
+
+
+def grade_submissions(bank, submissions):
+    """批量判分多份答卷，每份答卷为 {'answers': {题号: 答案}, ...}，返回每份的得分"""
+    rows = []
+    spans = []
+    for submission in submissions:
+        answers = submission.get('answers') or {}
+        spans.append((len(rows), len(answers)))
+        rows.extend(answers.items())
+    results = grade_batch(bank, rows)
+
+    graded = []
+    for submission, (start, count) in zip(submissions, spans):
+        correct_count = sum(1 for result in results[start:start + count] if result)
+        graded.append({
+            'user_id': submission.get('user_id'),
+            'exam_id': submission.get('exam_id'),
+            'total': count,
+            'correct_count': correct_count,
+            'score': int(correct_count / count * 100) if count else 0
+        })
+    return graded
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("用法: python grading.py answers.jsonl [输出文件]")
+        sys.exit(1)
+
+    from question_bank import question_bank
+    bank = question_bank.snapshot()
+
+    submissions = []
+    with open(sys.argv[1], 'r', encoding='utf-8') as f:
+        for lineno, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                submissions.append(json.loads(line))
+            except ValueError:
+                print(f"第 {lineno} 行不是有效的JSON，已跳过")
+
+    graded = grade_submissions(bank, submissions)
+    out = open(sys.argv[2], 'w', encoding='utf-8') if len(sys.argv) > 2 else sys.stdout
+    for result in graded:
+        out.write(json.dumps(result, ensure_ascii=False) + '\n')
+    if out is not sys.stdout:
+        out.close()
+
+    answered = sum(result['total'] for result in graded)
+    correct = sum(result['correct_count'] for result in graded)
+    print(f"共判分 {len(graded)} 份答卷、{answered} 道题，答对 {correct} 道"
+          f"（{'numpy' if numpy is not None else '逐条比较'}）", file=sys.stderr)
@@ -0,0 +1,54 @@
+# gunicorn 配置 - 业余无线电考试系统后端
+# 用法: gunicorn -c gunicorn.conf.py wsgi:application
+# 所有参数都可以通过环境变量调整，见 config.py
+
+import os
+import sys
+
+# 读取配置文件时 backend 目录可能还不在 sys.path 中
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from config import BIND, WORKERS, THREADS, JSON_WRITE_BEHIND, STORAGE_BACKEND
+
+bind = BIND
+worker_class = 'gthread'
+threads = THREADS
+workers = WORKERS
+
+# 写后日志把数据保存在进程内存中，只能单进程运行（用线程提高并发）
+if JSON_WRITE_BEHIND and STORAGE_BACKEND != 'sqlite' and workers > 1:
+    print("写后日志模式只支持单进程，workers 已调整为 1")
+    workers = 1
+
+# 在 master 进程中预加载应用（题库、用户目录），fork 出的 worker 共享这些内存页
+preload_app = True
+
+timeout = 30
+graceful_timeout = 30
+keepalive = 5
+
+# 日志输出到标准输出，由 systemd 收集
+accesslog = '-'
+errorlog = '-'
+loglevel = 'info'
+
+
+def on_starting(server):
+    """master 启动时清空上次运行留下的各 worker 指标快照（计数器从0开始）"""
+    from config import METRICS_DIR
+    from metrics import SharedSnapshots
+
+    if METRICS_DIR:
+        SharedSnapshots(METRICS_DIR).clear()
+
+
+def post_fork(server, worker):
+    """worker fork 之后重置不能跨进程共享的资源"""
+    import app as app_module
+    import metrics
+
+    metrics.after_fork()
+
+    after_fork = getattr(app_module.store, 'after_fork', None)
+    if after_fork:
+        after_fork()
@@ -0,0 +1,66 @@
+import gzip
+
+from flask import request, Response
+
+# brotli 是可选依赖，没有安装时只提供 gzip
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+class PrecompressedBody:
+    """预先序列化并压缩好的响应体，按内容哈希生成强 ETag"""
+
+    def __init__(self, data, digest, mimetype='application/json'):
+        self.mimetype = mimetype
+        # 编码 -> (响应体, ETag)；不同编码是不同的表示，ETag 也不同
+        self.variants = {'identity': (data, f'"{digest}"')}
+        self.variants['gzip'] = (gzip.compress(data, compresslevel=9, mtime=0), f'"{digest}-gzip"')
+        if brotli is not None:
+            self.variants['br'] = (brotli.compress(data, quality=9), f'"{digest}-br"')
+        self.etags = {etag for _, etag in self.variants.values()}
+
+    def choose_encoding(self, accept_encoding):
+        """按客户端支持的编码选择，优先 br，其次 gzip"""
+        accepted = set()
+        for part in accept_encoding.split(','):
+            coding, _, params = part.strip().partition(';')
+            if params.replace(' ', '') in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+                continue
+            accepted.add(coding.strip().lower())
+        for encoding in ('br', 'gzip'):
+            if encoding in self.variants and (encoding in accepted or '*' in accepted):
+                return encoding
+        return 'identity'
+
+
+def _if_none_match_tags():
+    header = request.headers.get('If-None-Match', '')
+    tags = set()
+    for tag in header.split(','):
+        tag = tag.strip()
+        if tag.startswith('W/'):
+            tag = tag[2:]
+        if tag:
+            tags.add(tag)
+    return tags
+
+
+def send_precompressed(body, cache_control='private, no-cache'):
+    """发送预压缩响应；If-None-Match 命中时返回 304，不发送响应体"""
+    encoding = body.choose_encoding(request.headers.get('Accept-Encoding', ''))
+    data, etag = body.variants[encoding]
+
+    client_tags = _if_none_match_tags()
+    if '*' in client_tags or client_tags & body.etags:
+        response = Response(status=304)
+    else:
+        response = Response(data, mimetype=body.mimetype)
+        if encoding != 'identity':
+            response.headers['Content-Encoding'] = encoding
+
+    response.headers['ETag'] = etag
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Cache-Control'] = cache_control
+    return response
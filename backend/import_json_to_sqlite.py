@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+SQLite导入脚本
+把现有的 users.json 和错题本（分片目录以及旧版 wrong_questions.json）导入SQLite数据库
+导入后设置环境变量 RADIO_EXAM_STORAGE=sqlite 即可切换到SQLite存储
+"""
+
+import json
+import os
+import sys
+
+from config import DATA_DIR, SQLITE_PATH
+from json_store import ShardedWrongQuestionStore, read_json
+from sqlite_store import SQLiteStore
+
+def import_json_to_sqlite(db_path=SQLITE_PATH):
+    """导入JSON数据到SQLite"""
+    users_file = os.path.join(DATA_DIR, "users.json")
+    wrong_questions_file = os.path.join(DATA_DIR, "wrong_questions.json")
+    shards_dir = os.path.join(DATA_DIR, "wrong_questions")
+
+    try:
+        users = read_json(users_file, {})
+    except json.JSONDecodeError as e:
+        print(f"解析用户文件失败: {e}")
+        return False
+
+    # 合并错题本：旧版全局文件在前，分片数据覆盖其上
+    all_wrong_questions = {}
+    if os.path.exists(wrong_questions_file):
+        try:
+            legacy = read_json(wrong_questions_file, {})
+        except json.JSONDecodeError as e:
+            print(f"解析原错题文件失败: {e}")
+            return False
+        for user_id, wrong_questions in legacy.items():
+            if isinstance(wrong_questions, dict) and 'question' in wrong_questions:
+                print("检测到旧的全局错题格式，请先运行 migrate_wrong_questions.py")
+                return False
+            all_wrong_questions[str(user_id)] = dict(wrong_questions)
+    for user_id, wrong_questions in ShardedWrongQuestionStore(shards_dir).iter_users():
+        all_wrong_questions.setdefault(str(user_id), {}).update(wrong_questions)
+
+    store = SQLiteStore(db_path)
+    store.save_users(users)
+    for user_id, wrong_questions in all_wrong_questions.items():
+        store.save_wrong_questions(user_id, wrong_questions)
+
+    question_count = sum(len(wrong_questions) for wrong_questions in all_wrong_questions.values())
+    print(f"已导入 {len(users)} 个用户、{len(all_wrong_questions)} 个用户的 {question_count} 道错题到 {db_path}")
+    return True
+
+if __name__ == "__main__":
+    print("开始导入JSON数据到SQLite...")
+    if import_json_to_sqlite(*sys.argv[1:2]):
+        print("导入完成")
+    else:
+        print("导入失败")
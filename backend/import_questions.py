@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+题库增量导入脚本
+重新解析 data/pdf_content.txt，按题号与现有题库（data/questions.json）逐题比较内容哈希，
+只有新增、修改或删除了题目时才写入题库文件并输出变更报告；
+内容没有变化时不写文件，题库版本号（文件内容哈希）保持不变，客户端缓存继续有效
+
+用法: python import_questions.py [题库文本路径] [--dry-run] [--json]
+"""
+
+import hashlib
+import json
+import os
+import sys
+
+from config import DATA_DIR
+from json_store import read_json, write_json_atomic
+import pdf_parser
+
+QUESTIONS_FILE = os.path.join(DATA_DIR, "questions.json")
+SOURCE_FILE = os.path.join(DATA_DIR, "pdf_content.txt")
+
+
+def question_hash(question):
+    """题目内容哈希（字段顺序无关）"""
+    encoded = json.dumps(question, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+
+def diff_questions(current, parsed):
+    """按题号比较现有题库和新解析的题目
+
+    返回 (合并后的题目列表, 变更报告)。合并时保留现有题目的顺序，修改的题目原位替换，
+    新增的题目按解析顺序追加在最后，按序号组卷的范围不会因为新增题目而错位
+    （删除题目时，它后面的题目序号仍会前移）。
+    """
+    current_by_id = {q['id']: q for q in current}
+    parsed_by_id = {}
+    duplicates = []
+    for q in parsed:
+        if q['id'] in parsed_by_id:
+            duplicates.append(q['id'])
+        parsed_by_id[q['id']] = q
+
+    added, changed, removed = [], [], []
+    for q_id, new in parsed_by_id.items():
+        old = current_by_id.get(q_id)
+        if old is None:
+            added.append(q_id)
+        elif question_hash(old) != question_hash(new):
+            changed.append(q_id)
+
+    changed_ids = set(changed)
+    merged = []
+    for old in current:
+        new = parsed_by_id.get(old['id'])
+        if new is None:
+            removed.append(old['id'])
+            continue
+        merged.append(new if old['id'] in changed_ids else old)
+    merged.extend(parsed_by_id[q_id] for q_id in added)
+
+    report = {
+        'added': added,
+        'changed': changed,
+        'removed': removed,
+        'unchanged': len(parsed_by_id) - len(added) - len(changed),
+        'duplicates': duplicates,
+        'total': len(merged)
+    }
+    return merged, report
+
+
+def import_questions(source=SOURCE_FILE, questions_file=QUESTIONS_FILE, dry_run=False):
+    """增量导入题目，返回变更报告（解析失败返回 None）"""
+    if not os.path.exists(source):
+        print(f"题库文本文件不存在: {source}")
+        return None
+
+    with open(source, 'r', encoding='utf-8') as f:
+        parsed = list(pdf_parser.iter_questions(f))
+    if not parsed:
+        # 解析不出题目时不能当成"全部删除"
+        print("没有解析出任何题目，题库保持不变")
+        return None
+
+    try:
+        current = read_json(questions_file, [])
+    except json.JSONDecodeError as e:
+        print(f"现有题库文件解析失败，将整体重建: {e}")
+        current = []
+
+    merged, report = diff_questions(current, parsed)
+    report['written'] = False
+    if report['added'] or report['changed'] or report['removed']:
+        if not dry_run:
+            # 原子替换，运行中的服务按文件变化自动加载新版本
+            write_json_atomic(questions_file, merged, indent=2)
+            report['written'] = True
+    elif not os.path.exists(questions_file) and not dry_run:
+        write_json_atomic(questions_file, merged, indent=2)
+        report['written'] = True
+    return report
+
+
+def print_report(report, limit=20):
+    """打印变更报告"""
+    def preview(ids):
+        text = '、'.join(ids[:limit])
+        return text + (f" 等 {len(ids)} 道" if len(ids) > limit else '')
+
+    print(f"新增 {len(report['added'])} 道，修改 {len(report['changed'])} 道，"
+          f"删除 {len(report['removed'])} 道，未变 {report['unchanged']} 道，导入后共 {report['total']} 道")
+    for key, label in (('added', '新增'), ('changed', '修改'), ('removed', '删除')):
+        if report[key]:
+            print(f"  {label}: {preview(report[key])}")
+    if report['duplicates']:
+        print(f"  题库文本中重复的题号（以最后一次出现为准）: {preview(report['duplicates'])}")
+    print("题库文件已更新" if report['written'] else "题库文件未修改")
+
+
+if __name__ == "__main__":
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    report = import_questions(args[0] if args else SOURCE_FILE, dry_run='--dry-run' in sys.argv)
+    if report is None:
+        sys.exit(1)
+    if '--json' in sys.argv:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        print_report(report)
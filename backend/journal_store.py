@@ -0,0 +1,450 @@
+import os
+import json
+import time
+import atexit
+import threading
+
+import metrics
+
+
+def _copy_users(users):
+    return {user_id: dict(user) for user_id, user in users.items()}
+
+def _copy_wrong_questions(wrong_questions):
+    return {q_id: dict(entry) for q_id, entry in wrong_questions.items()}
+
+
+class JournaledJsonStore:
+    """JSON文件的写后（write-behind）存储
+
+    - 修改以一行JSON追加到日志文件并 fsync，落盘成功后才在内存中生效，然后请求才返回；
+      fsync 失败时修改不会生效，调用方得到 IOError
+    - 短时间窗口内同时到达的修改合并成一次写入和一次 fsync（组提交）
+    - 后台线程定期把日志中的修改折叠进 users.json 和错题本分片（原子改名），然后删除日志
+    - 启动时先重放残留的日志，所以崩溃后不会丢失已返回成功的修改
+
+    内存中的数据是权威副本，只适用于单进程部署（可以多线程）。
+    fork 出的进程第一次使用前重新加载主文件和日志（gunicorn 预加载时状态在 master 中加载，
+    之后重启的 worker 继承的是 master 启动时的旧状态）。
+    """
+
+    def __init__(self, base, journal_path, commit_window=0.002, compact_interval=5.0):
+        self.base = base
+        self.journal_path = journal_path
+        self.compacting_path = journal_path + '.compacting'
+        self.commit_window = commit_window
+        self.compact_interval = compact_interval
+
+        # 内存状态
+        self._state_lock = threading.RLock()
+        self._users = {}
+        self._wrong = {}
+        self._dirty_users = False
+        self._dirty_wrong = set()
+        self._users_revision = 0
+
+        # 组提交
+        self._commit_cond = threading.Condition()
+        self._pending = []
+        self._enqueued_seq = 0
+        self._durable_seq = 0
+        self._failure = None
+        self._journal_generation = 0
+        # 提交线程正在写入/应用一批修改；压缩时暂停提交，保证日志和内存状态一致
+        self._inflight = False
+        self._paused = False
+
+        self._compact_lock = threading.Lock()
+        self._pid = None
+        # 内存状态是在哪个进程中加载的
+        self._reload_lock = threading.Lock()
+        self._loaded_pid = None
+
+        directory = os.path.dirname(journal_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._recover()
+        self._loaded_pid = os.getpid()
+        self.compact()
+        atexit.register(self.compact)
+
+    # ---- 启动与后台线程 ----
+    def _recover(self):
+        """加载主文件并重放残留日志"""
+        with self._state_lock:
+            self._users = self.base.load_users()
+            replayed = 0
+            for path in (self.compacting_path, self.journal_path):
+                if not os.path.exists(path):
+                    continue
+                with open(path, 'r', encoding='utf-8') as f:
+                    for lineno, line in enumerate(f, 1):
+                        line = line.strip()
+                        if not line:
+                            continue
+                        try:
+                            record = json.loads(line)
+                        except ValueError:
+                            # 崩溃时最后一行可能只写了一半，这一行对应的请求没有返回成功
+                            print(f"日志 {path} 第 {lineno} 行不完整，已忽略")
+                            break
+                        self._load_for(record)
+                        self._apply(record)
+                        replayed += 1
+            if replayed:
+                print(f"已重放 {replayed} 条写后日志")
+
+    def after_fork(self):
+        """fork 出的 worker 在处理请求之前重新加载状态（gunicorn post_fork 调用）"""
+        self._reload_if_forked()
+        self._ensure_threads()
+
+    def _reload_if_forked(self):
+        """当前进程不是加载内存状态的进程时，丢弃继承的状态，重新加载主文件并重放日志
+
+        继承的状态可能早于其他 worker 已经写入的修改，直接使用会在压缩时把这些修改覆盖掉。
+        """
+        if self._loaded_pid == os.getpid():
+            return
+        with self._reload_lock:
+            if self._loaded_pid == os.getpid():
+                return
+            with self._commit_cond:
+                self._pending = []
+                self._enqueued_seq = self._durable_seq = 0
+                self._failure = None
+                self._inflight = False
+                self._paused = False
+                self._journal_generation += 1
+            with self._state_lock:
+                self._wrong = {}
+                self._dirty_users = False
+                self._dirty_wrong = set()
+                self._recover()
+                # 让用户目录重新加载
+                self._users_revision += 1
+            self._loaded_pid = os.getpid()
+        self.compact()
+
+    def _ensure_threads(self):
+        """在当前进程中启动提交线程和压缩线程（fork 之后需要重新启动）"""
+        if self._pid == os.getpid():
+            return
+        self._reload_if_forked()
+        with self._commit_cond:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            threading.Thread(target=self._commit_loop, name='journal-commit', daemon=True).start()
+            threading.Thread(target=self._compact_loop, name='journal-compact', daemon=True).start()
+
+    def _commit_loop(self):
+        """提交线程：把等待中的日志行批量写入并 fsync 一次"""
+        journal = None
+        generation = None
+        while True:
+            with self._commit_cond:
+                while not self._pending:
+                    self._commit_cond.wait()
+            # 等待一个短窗口，让同时到达的写入共用一次 fsync
+            if self.commit_window:
+                time.sleep(self.commit_window)
+            with self._commit_cond:
+                while self._paused:
+                    self._commit_cond.wait()
+                self._inflight = True
+                batch = self._pending
+                self._pending = []
+                first_seq = self._durable_seq + 1
+                last_seq = self._enqueued_seq
+                if generation != self._journal_generation:
+                    if journal is not None:
+                        journal.close()
+                        journal = None
+                    generation = self._journal_generation
+            failure = None
+            try:
+                # 先把修改涉及的错题本分片读入内存，读取失败（如分片损坏）时这一批不写入日志，
+                # 落盘之后的应用只修改内存
+                with self._state_lock:
+                    for _, record in batch:
+                        self._load_for(record)
+            except Exception as e:
+                print(f"读取错题本失败: {e}")
+                failure = (first_seq, last_seq, e)
+            if not failure:
+                offset = None
+                try:
+                    if journal is None:
+                        journal = open(self.journal_path, 'a', encoding='utf-8')
+                    offset = journal.tell()
+                    journal.write(''.join(line + '\n' for line, _ in batch))
+                    journal.flush()
+                    os.fsync(journal.fileno())
+                except Exception as e:
+                    print(f"写入日志失败: {e}")
+                    failure = (first_seq, last_seq, e)
+                    if journal is not None:
+                        # 去掉可能已写入一部分的行，重启时不能重放没有生效的修改
+                        try:
+                            journal.truncate(offset)
+                        except (OSError, TypeError, ValueError):
+                            pass
+                        journal.close()
+                        journal = None
+            if not failure:
+                # 落盘成功后按日志顺序应用到内存
+                try:
+                    with self._state_lock:
+                        for _, record in batch:
+                            self._apply(record)
+                except Exception as e:
+                    # 不应该发生（_apply 只修改内存）；通知调用方失败，提交线程继续运行，
+                    # 不能让后面的写入和压缩一直等待
+                    print(f"应用日志失败: {e}")
+                    failure = (first_seq, last_seq, e)
+            with self._commit_cond:
+                self._durable_seq = last_seq
+                self._inflight = False
+                if failure:
+                    self._failure = failure
+                self._commit_cond.notify_all()
+
+    def _compact_loop(self):
+        while True:
+            time.sleep(self.compact_interval)
+            try:
+                self.compact()
+            except Exception as e:
+                print(f"压缩日志失败: {e}")
+
+    # ---- 修改 ----
+    def _apply(self, record):
+        """把一条日志记录应用到内存状态（记录都是幂等的覆盖操作，可以重复重放）"""
+        op = record['op']
+        if op == 'users':
+            self._users = _copy_users(record['value'])
+            self._dirty_users = True
+            self._users_revision += 1
+        elif op == 'user':
+            if record['value'] is None:
+                self._users.pop(record['key'], None)
+            else:
+                self._users[record['key']] = dict(record['value'])
+            self._dirty_users = True
+            self._users_revision += 1
+        elif op == 'users_add':
+            for user in record['value']:
+                self._users[user['user_id']] = dict(user)
+            self._dirty_users = True
+            self._users_revision += 1
+        elif op == 'wrong':
+            user_id = record['user_id']
+            if record.get('replace'):
+                wrong_questions = {}
+                self._wrong[user_id] = wrong_questions
+            else:
+                wrong_questions = self._wrong[user_id]
+            for q_id, entry in record['value'].items():
+                if entry is None:
+                    wrong_questions.pop(q_id, None)
+                else:
+                    wrong_questions[q_id] = dict(entry)
+            self._dirty_wrong.add(user_id)
+        elif op == 'wrong_all':
+            # 先把已有分片全部置空（_load_for 已把所有分片的用户读入内存），再写入新数据
+            for user_id in list(self._wrong):
+                self._wrong[user_id] = {}
+                self._dirty_wrong.add(user_id)
+            for user_id, wrong_questions in record['value'].items():
+                self._wrong[str(user_id)] = _copy_wrong_questions(wrong_questions)
+                self._dirty_wrong.add(str(user_id))
+
+    def _load_for(self, record):
+        """把应用这条记录需要的错题本分片读入内存（可能读文件失败，_apply 本身只修改内存）"""
+        op = record['op']
+        if op == 'wrong' and not record.get('replace'):
+            self._wrong_questions_of(record['user_id'])
+        elif op == 'wrong_all':
+            for user_id, wrong_questions in self.base.wrong_questions.iter_users():
+                self._wrong.setdefault(str(user_id), wrong_questions)
+
+    def _wrong_questions_of(self, user_id):
+        """获取内存中的用户错题本，第一次访问时从分片加载"""
+        wrong_questions = self._wrong.get(user_id)
+        if wrong_questions is None:
+            wrong_questions = self.base.load_wrong_questions(user_id)
+            self._wrong[user_id] = wrong_questions
+        return wrong_questions
+
+    def _mutate(self, record):
+        """写日志，日志落盘并应用到内存状态后返回"""
+        self._ensure_threads()
+        started = time.perf_counter()
+        line = json.dumps(record, ensure_ascii=False)
+        with self._commit_cond:
+            self._pending.append((line, record))
+            self._enqueued_seq += 1
+            seq = self._enqueued_seq
+            self._commit_cond.notify_all()
+        failure = self._wait_durable(seq)
+        metrics.observe_io('append', self.journal_path, time.perf_counter() - started,
+                           len(line.encode('utf-8')) + 1)
+        if failure and failure[0] <= seq <= failure[1]:
+            raise IOError(f"写入日志失败: {failure[2]}")
+
+    def _wait_durable(self, seq):
+        """等待序号 seq 之前的日志都处理完，返回最近一次写入失败的信息"""
+        with self._commit_cond:
+            while self._durable_seq < seq:
+                self._commit_cond.wait()
+            return self._failure
+
+    # ---- 压缩 ----
+    def compact(self):
+        """把内存中的修改写入主文件，然后删除已折叠的日志"""
+        if self._loaded_pid != os.getpid():
+            # 继承自父进程、还没有重新加载的状态不能写回主文件
+            return
+        with self._compact_lock:
+            # 暂停提交并等正在处理的一批完成：此时日志中的每一行都已应用到内存
+            with self._commit_cond:
+                self._paused = True
+                while self._inflight:
+                    self._commit_cond.wait()
+            try:
+                with self._state_lock:
+                    if not self._dirty_users and not self._dirty_wrong:
+                        return
+                    users = _copy_users(self._users) if self._dirty_users else None
+                    wrong = {user_id: _copy_wrong_questions(self._wrong.get(user_id, {}))
+                             for user_id in self._dirty_wrong}
+                    self._dirty_users = False
+                    self._dirty_wrong = set()
+                    self._rotate_journal()
+            finally:
+                with self._commit_cond:
+                    self._paused = False
+                    self._commit_cond.notify_all()
+
+            try:
+                if users is not None:
+                    self.base.save_users(users)
+                for user_id, wrong_questions in wrong.items():
+                    self.base.save_wrong_questions(user_id, wrong_questions)
+                if os.path.exists(self.compacting_path):
+                    os.remove(self.compacting_path)
+            except Exception:
+                # 主文件没写成功，保留日志并在下次重试
+                with self._state_lock:
+                    if users is not None:
+                        self._dirty_users = True
+                    self._dirty_wrong.update(wrong)
+                raise
+
+    def _rotate_journal(self):
+        """把当前日志并入待压缩日志，之后的修改写到新的日志文件"""
+        if os.path.exists(self.journal_path):
+            if os.path.exists(self.compacting_path):
+                # 上一次压缩失败留下的日志，合并到一起
+                with open(self.journal_path, 'r', encoding='utf-8') as src, \
+                        open(self.compacting_path, 'a', encoding='utf-8') as dst:
+                    dst.write(src.read())
+                    dst.flush()
+                    os.fsync(dst.fileno())
+                os.remove(self.journal_path)
+            else:
+                os.replace(self.journal_path, self.compacting_path)
+        with self._commit_cond:
+            self._journal_generation += 1
+
+    # ---- 读取 ----
+    def users_revision(self):
+        self._reload_if_forked()
+        return self._users_revision
+
+    def load_users(self):
+        self._reload_if_forked()
+        with self._state_lock:
+            return _copy_users(self._users)
+
+    def load_wrong_questions(self, user_id):
+        self._reload_if_forked()
+        with self._state_lock:
+            return _copy_wrong_questions(self._wrong_questions_of(str(user_id)))
+
+    def get_wrong_question(self, user_id, q_id):
+        self._reload_if_forked()
+        with self._state_lock:
+            entry = self._wrong_questions_of(str(user_id)).get(q_id)
+            return dict(entry) if entry else None
+
+    def load_all_wrong_questions(self):
+        self._reload_if_forked()
+        with self._state_lock:
+            all_wrong_questions = self.base.load_all_wrong_questions()
+            for user_id, wrong_questions in self._wrong.items():
+                if wrong_questions:
+                    all_wrong_questions[user_id] = _copy_wrong_questions(wrong_questions)
+                else:
+                    all_wrong_questions.pop(user_id, None)
+            return all_wrong_questions
+
+    # ---- 写入（与 JsonStore 接口一致） ----
+    def save_users(self, users):
+        self._mutate({'op': 'users', 'value': users})
+
+    def save_user(self, user):
+        self._mutate({'op': 'user', 'key': user['user_id'], 'value': user})
+
+    def add_users(self, new_users):
+        self._reload_if_forked()
+        with self._state_lock:
+            users = set(self._users)
+            phones = {user.get('phone') for user in self._users.values()}
+        accepted, rejected = [], []
+        for user in new_users:
+            if user['user_id'] not in users and user['phone'] in phones:
+                rejected.append(user['user_id'])
+            else:
+                accepted.append(user)
+                phones.add(user['phone'])
+        if accepted:
+            self._mutate({'op': 'users_add', 'value': accepted})
+        return rejected
+
+    def delete_user(self, user_id):
+        self._mutate({'op': 'user', 'key': user_id, 'value': None})
+
+    def save_wrong_questions(self, user_id, wrong_questions):
+        self._mutate({'op': 'wrong', 'user_id': str(user_id), 'replace': True, 'value': wrong_questions})
+
+    def update_wrong_questions(self, user_id, changes):
+        self._mutate({'op': 'wrong', 'user_id': str(user_id), 'value': changes})
+
+    def save_all_wrong_questions(self, all_wrong_questions):
+        self._mutate({'op': 'wrong_all', 'value': all_wrong_questions})
+
+    # ---- 考试会话（不经过写后日志，直接写主存储） ----
+    def save_exam_session(self, session):
+        self.base.save_exam_session(session)
+
+    def update_open_exam_session(self, session):
+        return self.base.update_open_exam_session(session)
+
+    def load_exam_session(self, exam_id):
+        return self.base.load_exam_session(exam_id)
+
+    def delete_exam_session(self, exam_id):
+        self.base.delete_exam_session(exam_id)
+
+    def purge_exam_sessions(self, now):
+        return self.base.purge_exam_sessions(now)
+
+    # ---- 计数器（不经过写后日志，直接写主存储） ----
+    def incr_counters(self, deltas):
+        self.base.incr_counters(deltas)
+
+    def load_counters(self, prefix=''):
+        return self.base.load_counters(prefix)
@@ -0,0 +1,364 @@
+import os
+import json
+import atexit
+import hashlib
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import quote, unquote
+
+import metrics
+
+# fcntl 只在类 Unix 系统上可用，没有时只在进程内加锁
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# 锁文件路径 -> 进程内的线程锁
+_thread_locks = {}
+_thread_locks_guard = threading.Lock()
+
+
+@contextmanager
+def locked(lock_path):
+    """串行化对同一份数据的读取-修改-写回：进程内用线程锁，多个 worker 进程之间用 fcntl.flock
+
+    同一个线程不能嵌套获取同一把锁。
+    """
+    with _thread_locks_guard:
+        thread_lock = _thread_locks.setdefault(lock_path, threading.Lock())
+    with thread_lock:
+        os.makedirs(os.path.dirname(lock_path) or '.', exist_ok=True)
+        with open(lock_path, 'a') as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def read_json(path, default=None):
+    """读取JSON文件，文件不存在时返回默认值"""
+    if not os.path.exists(path):
+        return default
+    started = time.perf_counter()
+    with open(path, 'rb') as f:
+        raw = f.read()
+    data = json.loads(raw.decode('utf-8'))
+    metrics.observe_io('load', path, time.perf_counter() - started, len(raw))
+    return data
+
+def write_json_atomic(path, data, indent=None, fsync=False):
+    """先写临时文件再原子替换，避免写到一半时崩溃留下残缺文件
+
+    fsync=True 时在替换前把数据刷到磁盘（写后日志压缩时使用）
+    """
+    started = time.perf_counter()
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix='.tmp-', suffix='.json', dir=directory)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=indent)
+            f.flush()
+            if fsync:
+                os.fsync(f.fileno())
+            nbytes = os.fstat(f.fileno()).st_size
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    metrics.observe_io('save', path, time.perf_counter() - started, nbytes)
+
+
+class ShardedWrongQuestionStore:
+    """按用户分片保存错题本，每个用户一个文件
+
+    目录结构: <root>/<用户ID哈希前两位>/<转义后的用户ID>.json
+    写入某个用户的错题本只会重写该用户自己的文件；写入时持有所在子目录的 .lock 文件锁。
+    """
+
+    def __init__(self, root, fsync=False):
+        self.root = root
+        self.fsync = fsync
+
+    def _shard_path(self, user_id):
+        user_id = str(user_id)
+        bucket = hashlib.sha1(user_id.encode('utf-8')).hexdigest()[:2]
+        return os.path.join(self.root, bucket, quote(user_id, safe='') + '.json')
+
+    def load(self, user_id):
+        """加载指定用户的错题本"""
+        shard = read_json(self._shard_path(user_id))
+        if not shard:
+            return {}
+        return shard.get('wrong_questions', {})
+
+    def _lock_path(self, user_id):
+        return os.path.join(os.path.dirname(self._shard_path(user_id)), '.lock')
+
+    def save(self, user_id, wrong_questions):
+        """保存指定用户的错题本，错题本为空时删除分片文件"""
+        with locked(self._lock_path(user_id)):
+            self._write(user_id, wrong_questions)
+
+    def update(self, user_id, changes):
+        """按题号更新错题记录（值为 None 表示删除），读取和写回之间持有文件锁"""
+        with locked(self._lock_path(user_id)):
+            wrong_questions = self.load(user_id)
+            for q_id, entry in changes.items():
+                if entry is None:
+                    wrong_questions.pop(q_id, None)
+                else:
+                    wrong_questions[q_id] = entry
+            self._write(user_id, wrong_questions)
+
+    def _write(self, user_id, wrong_questions):
+        path = self._shard_path(user_id)
+        if not wrong_questions:
+            if os.path.exists(path):
+                os.remove(path)
+            return
+        write_json_atomic(path, {
+            'user_id': str(user_id),
+            'wrong_questions': wrong_questions
+        }, fsync=self.fsync)
+
+    def iter_users(self):
+        """遍历所有分片，逐个返回 (用户ID, 错题本)"""
+        if not os.path.isdir(self.root):
+            return
+        for bucket in sorted(os.listdir(self.root)):
+            bucket_dir = os.path.join(self.root, bucket)
+            if not os.path.isdir(bucket_dir):
+                continue
+            for name in sorted(os.listdir(bucket_dir)):
+                if not name.endswith('.json') or name.startswith('.tmp-'):
+                    continue
+                shard = read_json(os.path.join(bucket_dir, name))
+                if not shard:
+                    continue
+                user_id = shard.get('user_id') or unquote(name[:-len('.json')])
+                yield user_id, shard.get('wrong_questions', {})
+
+    def load_all(self):
+        """加载所有用户的错题本 {用户ID: 错题本}"""
+        return {user_id: wrong_questions for user_id, wrong_questions in self.iter_users()}
+
+    def save_all(self, all_wrong_questions):
+        """用给定数据替换所有用户的错题本"""
+        for user_id, _ in list(self.iter_users()):
+            if str(user_id) not in all_wrong_questions:
+                self.save(user_id, {})
+        for user_id, wrong_questions in all_wrong_questions.items():
+            self.save(user_id, wrong_questions)
+
+
+class JsonStore:
+    """JSON文件存储后端：用户数据存 users.json，错题本按用户分片，考试会话每场一个文件"""
+
+    def __init__(self, users_file, wrong_questions_dir, fsync=False, sessions_dir=None, counters_file=None,
+                 counters_flush_interval=0.0):
+        self.users_file = users_file
+        self.fsync = fsync
+        self.wrong_questions = ShardedWrongQuestionStore(wrong_questions_dir, fsync=fsync)
+        self.sessions_dir = sessions_dir or os.path.join(os.path.dirname(users_file), 'exam_sessions')
+        self.counters_file = counters_file or os.path.join(os.path.dirname(users_file), 'counters.json')
+        self._counters_lock = threading.Lock()
+        # 计数器增量先在内存中累加，由后台线程每隔 counters_flush_interval 秒合并写入一次（0 表示每次直接写入）
+        self.counters_flush_interval = counters_flush_interval
+        self._pending_counters = {}
+        self._flusher_pid = None
+
+    # ---- 用户 ----
+    def load_users(self):
+        return read_json(self.users_file, {})
+
+    def save_users(self, users):
+        with locked(self.users_file + '.lock'):
+            write_json_atomic(self.users_file, users, indent=2, fsync=self.fsync)
+
+    def users_revision(self):
+        """用户数据的版本标识（文件的 mtime/size/inode），用于发现其他进程的写入"""
+        try:
+            st = os.stat(self.users_file)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+    # 修改单个用户时读取和写回 users.json 之间持有文件锁，多个 worker 同时修改不会互相覆盖
+    def save_user(self, user):
+        with locked(self.users_file + '.lock'):
+            users = self.load_users()
+            users[user['user_id']] = user
+            write_json_atomic(self.users_file, users, indent=2, fsync=self.fsync)
+
+    def add_users(self, new_users):
+        """批量添加用户，只读写一次用户文件；返回因手机号已被其他用户使用而没有添加的用户ID"""
+        with locked(self.users_file + '.lock'):
+            users = self.load_users()
+            phones = {user.get('phone') for user in users.values()}
+            rejected = []
+            for user in new_users:
+                if user['user_id'] not in users and user['phone'] in phones:
+                    rejected.append(user['user_id'])
+                    continue
+                users[user['user_id']] = user
+                phones.add(user['phone'])
+            if len(rejected) < len(new_users):
+                write_json_atomic(self.users_file, users, indent=2, fsync=self.fsync)
+        return rejected
+
+    def delete_user(self, user_id):
+        with locked(self.users_file + '.lock'):
+            users = self.load_users()
+            if users.pop(user_id, None) is not None:
+                write_json_atomic(self.users_file, users, indent=2, fsync=self.fsync)
+
+    # ---- 错题本 ----
+    def load_wrong_questions(self, user_id):
+        return self.wrong_questions.load(user_id)
+
+    def get_wrong_question(self, user_id, q_id):
+        return self.wrong_questions.load(user_id).get(q_id)
+
+    def load_all_wrong_questions(self):
+        return self.wrong_questions.load_all()
+
+    def save_wrong_questions(self, user_id, wrong_questions):
+        self.wrong_questions.save(user_id, wrong_questions)
+
+    def save_all_wrong_questions(self, all_wrong_questions):
+        self.wrong_questions.save_all(all_wrong_questions)
+
+    def update_wrong_questions(self, user_id, changes):
+        """按题号更新错题记录，值为 None 表示从错题本删除"""
+        self.wrong_questions.update(user_id, changes)
+
+    # ---- 考试会话 ----
+    def _session_path(self, exam_id):
+        # 考试ID由服务端生成（十六进制），其他字符一律视为不存在，防止路径穿越
+        if not exam_id or not all(c in '0123456789abcdef' for c in exam_id):
+            return None
+        return os.path.join(self.sessions_dir, exam_id + '.json')
+
+    def save_exam_session(self, session):
+        write_json_atomic(self._session_path(session['exam_id']), session)
+
+    def update_open_exam_session(self, session):
+        """会话尚未交卷时才写入（交卷和保存进度使用），返回是否写入；多个进程之间用文件锁串行化"""
+        path = self._session_path(session['exam_id'])
+        if path is None:
+            return False
+        with locked(os.path.join(self.sessions_dir, '.lock')):
+            try:
+                current = read_json(path)
+            except ValueError:
+                current = None
+            if current is None or current.get('submitted'):
+                return False
+            write_json_atomic(path, session)
+            return True
+
+    def load_exam_session(self, exam_id):
+        path = self._session_path(exam_id)
+        try:
+            return read_json(path) if path else None
+        except ValueError:
+            return None
+
+    def delete_exam_session(self, exam_id):
+        path = self._session_path(exam_id)
+        if path and os.path.exists(path):
+            os.remove(path)
+
+    def purge_exam_sessions(self, now):
+        """删除 expires_at 早于 now 的会话文件"""
+        if not os.path.isdir(self.sessions_dir):
+            return 0
+        removed = 0
+        for name in os.listdir(self.sessions_dir):
+            if not name.endswith('.json') or name.startswith('.'):
+                continue
+            path = os.path.join(self.sessions_dir, name)
+            try:
+                session = read_json(path)
+                if session is None or session.get('expires_at', 0) < now:
+                    os.remove(path)
+                    removed += 1
+            except (OSError, ValueError):
+                continue
+        return removed
+
+    # ---- 计数器（答题统计） ----
+    def incr_counters(self, deltas):
+        """批量累加计数器 {名称: 增量}
+
+        设置了 counters_flush_interval 时只在内存中累加（O(1)），不读写文件；
+        否则立即合并写入计数器文件。
+        """
+        if not deltas:
+            return
+        if not self.counters_flush_interval:
+            self._write_counters(deltas)
+            return
+        self._ensure_flusher()
+        with self._counters_lock:
+            for name, delta in deltas.items():
+                self._pending_counters[name] = self._pending_counters.get(name, 0) + delta
+
+    def _ensure_flusher(self):
+        """在当前进程中启动计数器写入线程（fork 之后需要重新启动）"""
+        if self._flusher_pid == os.getpid():
+            return
+        with self._counters_lock:
+            if self._flusher_pid == os.getpid():
+                return
+            self._flusher_pid = os.getpid()
+            # fork 之前累加的增量由父进程写入
+            self._pending_counters = {}
+            threading.Thread(target=self._flush_loop, name='counters-flush', daemon=True).start()
+            atexit.register(self.flush_counters)
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.counters_flush_interval)
+            try:
+                self.flush_counters()
+            except Exception as e:
+                print(f"写入计数器失败: {e}")
+
+    def flush_counters(self):
+        """把内存中累加的增量写入计数器文件；写入失败时增量保留到下一次"""
+        with self._counters_lock:
+            pending, self._pending_counters = self._pending_counters, {}
+        if not pending:
+            return
+        try:
+            self._write_counters(pending)
+        except Exception:
+            with self._counters_lock:
+                for name, delta in pending.items():
+                    self._pending_counters[name] = self._pending_counters.get(name, 0) + delta
+            raise
+
+    def _write_counters(self, deltas):
+        """读取-合并-写回计数器文件；多个进程同时写入时用文件锁串行化"""
+        with locked(self.counters_file + '.lock'):
+            counters = read_json(self.counters_file, {})
+            for name, delta in deltas.items():
+                counters[name] = counters.get(name, 0) + delta
+            write_json_atomic(self.counters_file, counters, fsync=self.fsync)
+
+    def load_counters(self, prefix=''):
+        """读取名称以 prefix 开头的计数器（包括本进程还没有写入文件的增量）"""
+        counters = read_json(self.counters_file, {})
+        with self._counters_lock:
+            for name, delta in self._pending_counters.items():
+                counters[name] = counters.get(name, 0) + delta
+        return {name: value for name, value in counters.items() if name.startswith(prefix)}
@@ -0,0 +1,328 @@
+"""
+进程内指标（Prometheus 文本格式，由 /metrics 输出）
+- 请求：按路由和方法统计延迟直方图、每个请求中 JSON 文件读写所占的时间，按状态码计数
+- JSON 文件读写：按操作（load/save/append）和文件统计耗时直方图和字节数
+
+多 worker 部署时各进程定期把自己的数据写入共享目录（SharedSnapshots），
+/metrics 输出所有 worker 合并后的数据。
+"""
+
+import atexit
+import bisect
+import json
+import os
+import tempfile
+import threading
+import time
+
+from flask import g, has_request_context
+
+# 多 worker 汇总（configure 之后生效）
+shared = None
+
+# 直方图的桶（秒），覆盖从单次小文件读写到慢请求
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class Histogram:
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        # 最后一个位置是 +Inf
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in pairs) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class MetricsRegistry:
+    """计数器和直方图，标签为 ((名称, 值), ...) 元组"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._meta = {}
+        self._counters = {}
+        self._histograms = {}
+        self._collectors = []
+
+    def describe(self, name, kind, help_text):
+        self._meta[name] = (kind, help_text)
+        if kind == 'counter':
+            self._counters.setdefault(name, {})
+        elif kind == 'histogram':
+            self._histograms.setdefault(name, {})
+
+    def inc(self, name, labels=(), value=1):
+        with self._lock:
+            series = self._counters[name]
+            series[labels] = series.get(labels, 0) + value
+
+    def observe(self, name, labels, value):
+        with self._lock:
+            series = self._histograms[name]
+            histogram = series.get(labels)
+            if histogram is None:
+                histogram = series[labels] = Histogram()
+            histogram.observe(value)
+
+    def reset(self):
+        """清空计数器和直方图（保留指标说明）"""
+        with self._lock:
+            for series in self._counters.values():
+                series.clear()
+            for series in self._histograms.values():
+                series.clear()
+
+    def add_collector(self, collect):
+        """注册在输出时才取值的指标，collect() 返回 [(名称, 类型, 说明, [(标签, 值)])]
+
+        counter 类型按所有 worker 求和；gauge 类型只输出处理本次抓取的 worker 的当前值。
+        """
+        self._collectors.append(collect)
+
+    def snapshot(self):
+        """本进程的计数器和直方图（可以写成JSON，由 merge_snapshots 合并）"""
+        counters = {}
+        histograms = {}
+        meta = {}
+        with self._lock:
+            for name, series in self._counters.items():
+                counters[name] = [[list(labels), value] for labels, value in series.items()]
+                meta[name] = self._meta[name]
+            for name, series in self._histograms.items():
+                histograms[name] = [[list(labels), list(histogram.counts), histogram.sum, histogram.count]
+                                    for labels, histogram in series.items()]
+                meta[name] = self._meta[name]
+        for collect in self._collectors:
+            for name, kind, help_text, samples in collect():
+                if kind == 'counter':
+                    counters[name] = [[list(labels), value] for labels, value in samples]
+                    meta[name] = (kind, help_text)
+        return {'meta': meta, 'counters': counters, 'histograms': histograms}
+
+    def render(self, others=()):
+        """输出 Prometheus 文本格式；others 为其他 worker 的快照，与本进程的数据合并后输出"""
+        merged = merge_snapshots([self.snapshot()] + list(others))
+        lines = []
+        for name, series in merged['counters'].items():
+            kind, help_text = merged['meta'][name]
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} counter')
+            for labels, value in series.items():
+                lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+        for name, series in merged['histograms'].items():
+            kind, help_text = merged['meta'][name]
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} histogram')
+            for labels, (counts, total, count) in series.items():
+                cumulative = 0
+                for bound, bucket_count in zip(BUCKETS + (float('inf'),), counts):
+                    cumulative += bucket_count
+                    lines.append(f'{name}_bucket{_format_labels(labels, [("le", _format_value(bound))])} '
+                                 f'{cumulative}')
+                lines.append(f'{name}_sum{_format_labels(labels)} {_format_value(total)}')
+                lines.append(f'{name}_count{_format_labels(labels)} {count}')
+        for collect in self._collectors:
+            for name, kind, help_text, samples in collect():
+                if kind == 'counter':
+                    continue
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} {kind}')
+                for labels, value in samples:
+                    lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+def merge_snapshots(snapshots):
+    """把多个进程的快照合并：计数器、直方图的各个桶、总和和次数分别相加"""
+    meta = {}
+    counters = {}
+    histograms = {}
+    for snapshot in snapshots:
+        meta.update({name: tuple(value) for name, value in snapshot.get('meta', {}).items()})
+        for name, series in snapshot.get('counters', {}).items():
+            merged = counters.setdefault(name, {})
+            for labels, value in series:
+                key = tuple(tuple(pair) for pair in labels)
+                merged[key] = merged.get(key, 0) + value
+        for name, series in snapshot.get('histograms', {}).items():
+            merged = histograms.setdefault(name, {})
+            for labels, counts, total, count in series:
+                key = tuple(tuple(pair) for pair in labels)
+                if key in merged and len(merged[key][0]) == len(counts):
+                    old_counts, old_total, old_count = merged[key]
+                    merged[key] = ([a + b for a, b in zip(old_counts, counts)], old_total + total, old_count + count)
+                else:
+                    merged[key] = (list(counts), total, count)
+    return {'meta': meta, 'counters': counters, 'histograms': histograms}
+
+
+class SharedSnapshots:
+    """多 worker 部署时汇总各进程的指标
+
+    每个 worker 的后台线程每隔 interval 秒把本进程的快照写入 directory/<pid>.json，
+    /metrics 读取其他 worker 的快照和本进程的实时数据合并后输出，无论抓取落在哪个 worker 上
+    结果都一致（其他 worker 的数据最多延迟 interval 秒）。已退出的 worker 的快照保留，
+    计数器不会倒退；服务启动时（gunicorn 的 on_starting）清空目录。
+    """
+
+    def __init__(self, directory, interval=5.0):
+        self.directory = directory
+        self.interval = interval
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _path(self, pid):
+        return os.path.join(self.directory, f'{pid}.json')
+
+    def ensure_writer(self):
+        """在当前进程中启动写快照的线程（fork 之后需要重新启动）"""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            first = self._pid is None
+            self._pid = os.getpid()
+            threading.Thread(target=self._write_loop, name='metrics-snapshot', daemon=True).start()
+            if first:
+                # worker 退出时写入最后一次快照（fork 出的进程继承这个注册）
+                atexit.register(self._write_at_exit)
+
+    def _write_at_exit(self):
+        if self._pid != os.getpid():
+            return
+        try:
+            self.write()
+        except Exception as e:
+            print(f"写入指标快照失败: {e}")
+
+    def _write_loop(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.write()
+            except Exception as e:
+                print(f"写入指标快照失败: {e}")
+
+    def write(self):
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(prefix='.tmp-', suffix='.json', dir=self.directory)
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(registry.snapshot(), f, ensure_ascii=False)
+            os.replace(tmp_path, self._path(os.getpid()))
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def others(self):
+        """读取其他进程的快照"""
+        if not os.path.isdir(self.directory):
+            return []
+        own = f'{os.getpid()}.json'
+        snapshots = []
+        for name in os.listdir(self.directory):
+            if not name.endswith('.json') or name.startswith('.') or name == own:
+                continue
+            try:
+                with open(os.path.join(self.directory, name), 'r', encoding='utf-8') as f:
+                    snapshots.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return snapshots
+
+    def clear(self):
+        """删除所有快照（服务启动时调用）"""
+        if not os.path.isdir(self.directory):
+            return
+        for name in os.listdir(self.directory):
+            if name.endswith('.json'):
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
+
+
+registry = MetricsRegistry()
+registry.describe('radio_exam_http_requests_total', 'counter', '按路由、方法和状态码统计的请求数')
+registry.describe('radio_exam_http_request_duration_seconds', 'histogram', '请求处理时间')
+registry.describe('radio_exam_http_request_io_seconds', 'histogram', '每个请求中 JSON 文件读写所用的时间')
+registry.describe('radio_exam_json_io_bytes_total', 'counter', 'JSON 文件读写的字节数')
+registry.describe('radio_exam_json_io_seconds', 'histogram', 'JSON 文件读写（含序列化和解析）的时间')
+
+
+def file_label(path):
+    """文件标签：分片目录（错题本、考试会话）下的文件按目录归类，其余使用文件名"""
+    parts = os.path.normpath(path).split(os.sep)
+    for directory in ('wrong_questions', 'exam_sessions'):
+        if directory in parts[:-1]:
+            return directory
+    return os.path.splitext(parts[-1])[0]
+
+
+def observe_io(operation, path, seconds, nbytes):
+    """记录一次 JSON 文件读写；在请求中发生时计入该请求的 I/O 时间"""
+    labels = (('operation', operation), ('file', file_label(path)))
+    registry.observe('radio_exam_json_io_seconds', labels, seconds)
+    registry.inc('radio_exam_json_io_bytes_total', labels, nbytes)
+    if has_request_context():
+        g.metrics_io_seconds = g.get('metrics_io_seconds', 0.0) + seconds
+
+
+def configure(directory, interval=5.0):
+    """设置多 worker 汇总使用的共享目录；directory 为空时只输出本进程的数据"""
+    global shared
+    shared = SharedSnapshots(directory, interval) if directory else None
+    return shared
+
+
+def render():
+    """输出所有 worker 合并后的指标"""
+    if shared is None:
+        return registry.render()
+    return registry.render(shared.others())
+
+
+def after_fork():
+    """worker fork 之后调用（gunicorn post_fork）：清空从 master 继承的数据
+
+    master 预加载时（题库、用户目录、计数器）记录的读写不属于任何 worker，
+    不清空的话每个 worker 的快照里都有一份，合并后会按 worker 数重复计算。
+    """
+    registry.reset()
+
+
+def observe_request(method, route, status, seconds, io_seconds):
+    """记录一个请求，route 使用路由规则（如 /api/exam/session/<exam_id>）以免标签无限增长"""
+    if shared is not None:
+        shared.ensure_writer()
+    labels = (('method', method), ('route', route))
+    registry.inc('radio_exam_http_requests_total', labels + (('status', str(status)),))
+    registry.observe('radio_exam_http_request_duration_seconds', labels, seconds)
+    registry.observe('radio_exam_http_request_io_seconds', labels, io_seconds)
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+错题本瘦身迁移脚本
+旧版错题记录中保存了整道题目的副本（'question' 字段），同一道题在每个用户的错题本里都存一份；
+现在错题记录只保存题号和计数，读取时从题库中取题目。
+本脚本删除错题本中题库里仍然存在的题目副本；题库中已删除的题目保留副本，错题本里仍能显示。
+
+迁移当前配置的存储后端（JSON分片或SQLite），以及尚未分片的旧版 wrong_questions.json。
+请在停止服务后运行（使用写后日志时，服务退出时会把日志合并进主文件）。
+"""
+
+import json
+import os
+
+from config import DATA_DIR, STORAGE_BACKEND, SQLITE_PATH
+from json_store import JsonStore, read_json, write_json_atomic
+from question_bank import QuestionBank
+
+def strip_question_copies(wrong_questions, bank):
+    """删除题库中存在的题目副本，返回删除的数量"""
+    stripped = 0
+    for q_id, entry in wrong_questions.items():
+        if 'question' in entry and bank.get(q_id):
+            del entry['question']
+            stripped += 1
+    return stripped
+
+def migrate_wrong_questions_to_refs():
+    """把错题记录中的题目副本替换为题号引用"""
+    bank = QuestionBank().snapshot()
+    if not bank.questions:
+        print("题库为空，无法确认哪些题目副本可以删除")
+        return False
+
+    total_stripped = 0
+    total_kept = 0
+
+    # 尚未迁移到分片的旧版全局错题文件
+    wrong_questions_file = os.path.join(DATA_DIR, "wrong_questions.json")
+    if os.path.exists(wrong_questions_file):
+        try:
+            all_wrong_questions = read_json(wrong_questions_file, {})
+        except json.JSONDecodeError as e:
+            print(f"解析原错题文件失败: {e}")
+            return False
+        before = os.path.getsize(wrong_questions_file)
+        stripped = sum(strip_question_copies(wrong_questions, bank)
+                       for wrong_questions in all_wrong_questions.values())
+        if stripped:
+            write_json_atomic(wrong_questions_file, all_wrong_questions, indent=2)
+            print(f"{wrong_questions_file}: 删除 {stripped} 个题目副本，"
+                  f"{before} 字节 -> {os.path.getsize(wrong_questions_file)} 字节")
+        total_stripped += stripped
+
+    if STORAGE_BACKEND == 'sqlite':
+        from sqlite_store import SQLiteStore
+        store = SQLiteStore(SQLITE_PATH)
+    else:
+        store = JsonStore(os.path.join(DATA_DIR, "users.json"), os.path.join(DATA_DIR, "wrong_questions"))
+
+    migrated_users = 0
+    for user_id, wrong_questions in store.load_all_wrong_questions().items():
+        stripped = strip_question_copies(wrong_questions, bank)
+        total_kept += sum(1 for entry in wrong_questions.values() if 'question' in entry)
+        if stripped:
+            store.save_wrong_questions(user_id, wrong_questions)
+            migrated_users += 1
+            total_stripped += stripped
+
+    print(f"已迁移 {migrated_users} 个用户的错题本，共删除 {total_stripped} 个题目副本")
+    if total_kept:
+        print(f"有 {total_kept} 道错题已不在题库中，保留了题目副本")
+    return True
+
+if __name__ == "__main__":
+    print("开始错题本瘦身迁移...")
+    if migrate_wrong_questions_to_refs():
+        print("错题本瘦身迁移完成")
+    else:
+        print("错题本瘦身迁移失败")
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+错题本分片迁移脚本
+将 data/wrong_questions.json（所有用户的错题在一个文件里）
+拆分为 data/wrong_questions/ 目录下每个用户一个分片文件
+JSON 存储后端的服务启动时（wsgi.py、python app.py）会自动运行
+"""
+
+import json
+import os
+import shutil
+from datetime import datetime
+
+from config import DATA_DIR, STORAGE_BACKEND
+from json_store import ShardedWrongQuestionStore
+
+def migrate_wrong_questions_to_shards():
+    """迁移错题数据到分片存储"""
+    wrong_questions_file = os.path.join(DATA_DIR, "wrong_questions.json")
+    shards_dir = os.path.join(DATA_DIR, "wrong_questions")
+
+    if not os.path.exists(wrong_questions_file):
+        print("没有找到旧版错题文件，无需迁移")
+        return True
+
+    # 读取原错题数据
+    all_wrong_questions = {}
+    with open(wrong_questions_file, 'r', encoding='utf-8') as f:
+        content = f.read().strip()
+        if content:
+            try:
+                all_wrong_questions = json.loads(content)
+            except json.JSONDecodeError as e:
+                print(f"解析原错题文件失败: {e}")
+                return False
+
+    # 旧的全局格式（没有按用户区分）需要先用 migrate_wrong_questions.py 迁移
+    for user_id, wrong_questions in all_wrong_questions.items():
+        if isinstance(wrong_questions, dict) and 'question' in wrong_questions:
+            print("检测到旧的全局错题格式，请先运行 migrate_wrong_questions.py")
+            return False
+
+    store = ShardedWrongQuestionStore(shards_dir)
+    migrated_users = 0
+    migrated_questions = 0
+    for user_id, wrong_questions in all_wrong_questions.items():
+        if not wrong_questions:
+            continue
+        # 分片中已有数据时合并，以旧文件中的记录为准
+        merged = store.load(user_id)
+        merged.update(wrong_questions)
+        store.save(user_id, merged)
+        migrated_users += 1
+        migrated_questions += len(wrong_questions)
+
+    # 迁移完成后把原文件改名备份，避免重复迁移
+    backup_file = f"{wrong_questions_file}.migrated.{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    shutil.move(wrong_questions_file, backup_file)
+    print(f"已将 {migrated_users} 个用户的 {migrated_questions} 道错题迁移到 {shards_dir}")
+    print(f"原错题文件已备份到: {backup_file}")
+    return True
+
+def migrate_on_startup():
+    """服务启动时调用：JSON 存储后端存在旧版错题文件时自动迁移，迁移失败时拒绝启动
+
+    分片存储不读取旧文件，不迁移就启动的话所有用户的错题本都是空的。
+    """
+    wrong_questions_file = os.path.join(DATA_DIR, "wrong_questions.json")
+    if STORAGE_BACKEND == 'sqlite' or not os.path.exists(wrong_questions_file):
+        return
+    print(f"检测到旧版错题文件 {wrong_questions_file}，迁移到分片存储...")
+    if not migrate_wrong_questions_to_shards():
+        raise SystemExit(f"旧版错题文件 {wrong_questions_file} 迁移失败，请按上面的提示处理后再启动服务")
+
+if __name__ == "__main__":
+    print("开始错题本分片迁移...")
+    if migrate_wrong_questions_to_shards():
+        print("错题本分片迁移完成")
+    else:
+        print("错题本分片迁移失败")
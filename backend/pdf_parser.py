@@ -1,69 +1,117 @@
 import re
 import os
 import json
+import time
 from datetime import datetime
 
-# 数据目录
-DATA_DIR = "data"
+from config import DATA_DIR
+import metrics
 global sn
 sn =0 
+# 题库文本中的标记：
+#   [J] 旧题号  [P] 考纲章节  [I] 题号  [Q] 题干  [T] 答案  [A]-[D] 选项  [F] 配图文件
+# [J]、[P] 写在所属题目的 [I] 之前，[F] 写在所属题目的选项之后；
+# 一行中可能有多个标记（如 "[Q]题干[T]A"），不以标记开头的行是上一字段的续行
+TAG_PATTERN = re.compile(r'\[([JPIQTABCDF])\]')
+OPTION_KEYS = 'ABCD'
+
+
+def iter_tokens(lines):
+    """逐行切分标记，生成 (行号, 标记, 文本)；续行合并到上一个标记的文本中"""
+    pending = None
+    for lineno, line in enumerate(lines, 1):
+        line = line.rstrip('\r\n')
+        matches = list(TAG_PATTERN.finditer(line))
+        head = line[:matches[0].start()] if matches else line
+        if head:
+            if pending is not None:
+                pending[2] += head
+            elif head.strip():
+                print(f"第 {lineno} 行不属于任何标记，已忽略: {head[:30]}")
+        for n, match in enumerate(matches):
+            if pending is not None:
+                yield tuple(pending)
+            end = matches[n + 1].start() if n + 1 < len(matches) else len(line)
+            pending = [lineno, match.group(1), line[match.end():end]]
+    if pending is not None:
+        yield tuple(pending)
+
+
+def _finish_question(record, lineno):
+    """校验并整理一道题，无效时打印所在行号并返回 None"""
+    problems = []
+    for field, tag in (('id', 'I'), ('question', 'Q'), ('correct', 'T')):
+        if not record.get(field):
+            problems.append(f"缺少[{tag}]")
+    options = record['options']
+    if len(options) < 2:
+        problems.append(f"只有 {len(options)} 个选项")
+    keys = {option['key'] for option in options}
+    if record.get('correct') and not set(record['correct']) <= keys:
+        problems.append(f"答案 {record['correct']} 不在选项中")
+    if problems:
+        print(f"第 {lineno} 行开始的题目 {record.get('id') or '(无题号)'} 无效：{'，'.join(problems)}")
+        return None
+
+    question = {
+        'id': record['id'],
+        'question': record['question'],
+        'correct': record['correct'],
+        'options': options
+    }
+    for field in ('section', 'legacy_id', 'image'):
+        if record.get(field):
+            question[field] = record[field]
+    return question
+
+
+def iter_questions(lines):
+    """单次遍历题库文本，逐题生成题目数据（lines 可以是文件对象，内存占用与文件大小无关）"""
+    record = None
+    start_line = 0
+    for lineno, tag, text in iter_tokens(lines):
+        text = text.strip()
+        # [J]/[P] 出现在已有题号的题目之后，或者遇到新的 [I]，说明上一道题结束
+        if record is None or (tag in 'JPI' and record.get('id')):
+            if record is not None:
+                question = _finish_question(record, start_line)
+                if question:
+                    yield question
+            record = {'options': []}
+            start_line = lineno
+
+        if tag == 'J':
+            # 一道题可能对应多个旧题号，如 "[J]LY0014、[J]LY0017"
+            text = text.rstrip('、')
+            record['legacy_id'] = f"{record['legacy_id']}、{text}" if record.get('legacy_id') else text
+        elif tag == 'P':
+            record['section'] = text
+        elif tag == 'I':
+            record['id'] = text
+        elif tag == 'Q':
+            record['question'] = text
+        elif tag == 'T':
+            record['correct'] = text.upper()
+        elif tag in OPTION_KEYS:
+            record['options'].append({'key': tag, 'text': text})
+        elif tag == 'F':
+            record['image'] = text
+
+    if record is not None:
+        question = _finish_question(record, start_line)
+        if question:
+            yield question
+
+
 def parse_pdf_content(pdf_text):
     """解析PDF文本内容，提取题目"""
-    questions = []
-    
-    # 更灵活的正则表达式匹配，处理PDF文本格式
-    pattern = r'\[I\].+?(?=\[I\]|$)'
-    question_blocks = re.findall(pattern, pdf_text, re.DOTALL)    
-    for block in question_blocks:
-        question_data = parse_question_block(block)
-        if question_data:
-            questions.append(question_data)
-        else:
-            print("无效题目：", question_data)
+    questions = list(iter_questions(pdf_text.splitlines()))
     print("共有多少道题：", len(questions))
-    
     return questions
 
 def parse_question_block(block):
-
-    question_data = {
-        'id': '',
-        'question': '',
-        'correct': '',
-        'options': []
-    }
-
-    """解析单个题目块"""
-    # print("正在解析题目：", block,"---",type(block))
-    par_ID = r'\[I\](.+?)(\n|\[Q\])'
-    question_data['id'] = re.findall(par_ID, block)[0][0]
-
-    
-
-    par_question = r'\[Q\](.+?)(\n|\[T\])'
-    question_data['question'] = re.findall(par_question, block)[0][0]
-
-    par_correct = r'\[T\](.+?)(\n|\[A\])'
-    question_data['correct'] = re.findall(par_correct, block)[0][0]
-
-    par_A = r'\[A\](.+?)(\[B\]|\n|$)'
-    par_B = r'\[B\](.+?)(\[C\]|\n|$)'
-    par_C = r'\[C\](.+?)(\[D\]|\n|$)'
-    par_D = r'\[D\](.+?)(\n|$)'
-
-
-    question_data['options'].append({'key': 'A', 'text': re.findall(par_A, block)[0][0]})
-    question_data['options'].append({'key': 'B', 'text': re.findall(par_B, block)[0][0]})
-    question_data['options'].append({'key': 'C', 'text': re.findall(par_C, block)[0][0]})
-    question_data['options'].append({'key': 'D', 'text': re.findall(par_D, block)[0][0]})
-
-    # 验证题目数据完整性
-    if (question_data['id'] and question_data['question'] and 
-        question_data['correct'] and len(question_data['options']) >= 2):
-        return question_data
-    else:
-        print("无效的题目数据：", question_data)
-    return question_data
+    """解析单个题目块，无效时返回 None"""
+    return next(iter_questions(block.splitlines()), None)
     
     
 def create_questions_from_pdf_text():
@@ -75,10 +123,12 @@ def create_questions_from_pdf_text():
         return []
    
     try:
+        started = time.perf_counter()
         with open(pdf_text_path, 'r', encoding='utf-8') as f:
-            pdf_content = f.read()
+            questions = list(iter_questions(f))
+        metrics.observe_io('load', pdf_text_path, time.perf_counter() - started,
+                           os.path.getsize(pdf_text_path))
         
-        questions = parse_pdf_content(pdf_content)
         print(f"从文本文件解析出 {len(questions)} 道题目")
         return questions
         
@@ -149,8 +199,11 @@ def save_questions(questions):
     """保存题目到JSON文件"""
     questions_file = os.path.join(DATA_DIR, "questions.json")
     try:
+        started = time.perf_counter()
         with open(questions_file, 'w', encoding='utf-8') as f:
             json.dump(questions, f, ensure_ascii=False, indent=2)
+            nbytes = f.tell()
+        metrics.observe_io('save', questions_file, time.perf_counter() - started, nbytes)
         print(f"题目已保存到 {questions_file}")
         return True
     except Exception as e:
@@ -168,8 +221,11 @@ def load_questions():
         return questions
     
     try:
-        with open(questions_file, 'r', encoding='utf-8') as f:
-            questions = json.load(f)
+        started = time.perf_counter()
+        with open(questions_file, 'rb') as f:
+            raw = f.read()
+        questions = json.loads(raw.decode('utf-8'))
+        metrics.observe_io('load', questions_file, time.perf_counter() - started, len(raw))
         print(f"从文件加载 {len(questions)} 道题目")
         return questions
     except Exception as e:
@@ -0,0 +1,186 @@
+import os
+import json
+import hashlib
+import threading
+import time
+
+import import_questions
+from http_cache import PrecompressedBody
+from question_search import SearchIndex
+import grading
+import metrics
+
+# 题库文件路径
+QUESTIONS_FILE = import_questions.QUESTIONS_FILE
+
+
+def encode_json(obj):
+    """紧凑的UTF-8 JSON编码"""
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def question_prefix(q_id):
+    """题号前缀，如 MC1-0003 -> MC1"""
+    return q_id.split('-', 1)[0]
+
+
+class BankSnapshot:
+    """某一版本题库的只读快照，重新加载时整体替换"""
+
+    def __init__(self, questions, version):
+        self.questions = questions
+        self.version = version
+        # 题号 -> 题目 / 题号 -> 在题库中的序号（从0开始）
+        self.by_id = {}
+        self.ordinal = {}
+        # 每道题预先编码好的JSON片段（按序号），组卷时直接拼接
+        self.fragments = []
+        # 题号前缀（MC1/MC2/MC3/MC4）-> 按序号排列的题目序号列表
+        self.prefix_index = {}
+        # 组卷分桶：(考纲章节, 题号前缀) -> 题目序号列表，如 ('1.1.1', 'MC1')
+        self.buckets = {}
+        # 组卷方案解析出的候选分桶（按方案名缓存，题库换版本时随快照一起丢弃）
+        self.plans = {}
+        # 按序号排列的正确答案位掩码（A=1, B=2, C=4, D=8），判分时直接比较整数
+        self.correct_masks = []
+        self._correct_mask_array = None
+        for i, q in enumerate(questions):
+            self.by_id[q['id']] = q
+            self.ordinal[q['id']] = i
+            self.fragments.append(encode_json(q))
+            self.correct_masks.append(grading.answer_mask(q.get('correct', '')))
+            prefix = question_prefix(q['id'])
+            self.prefix_index.setdefault(prefix, []).append(i)
+            self.buckets.setdefault((q.get('section', ''), prefix), []).append(i)
+        # 全文搜索的倒排索引（/api/questions/search 使用）
+        self.search_index = SearchIndex(questions)
+        # 整个题库只序列化、压缩一次（/api/questions 使用）
+        self.questions_body = PrecompressedBody(b'[' + b','.join(self.fragments) + b']', version[:32])
+
+    def __len__(self):
+        return len(self.questions)
+
+    def get(self, q_id):
+        """按题号获取题目，不存在返回 None"""
+        return self.by_id.get(q_id)
+
+    def index_of(self, q_id):
+        """按题号获取题目序号，不存在返回 None"""
+        return self.ordinal.get(q_id)
+
+    def correct_mask_array(self):
+        """正确答案位掩码的 numpy 数组（批量判分使用，第一次调用时创建）"""
+        if self._correct_mask_array is None:
+            self._correct_mask_array = grading.numpy.array(self.correct_masks, dtype=grading.numpy.int64)
+        return self._correct_mask_array
+
+    def ordinals_for(self, prefixes=None):
+        """按前缀过滤后的题目序号列表（升序），不过滤时返回全部序号"""
+        if not prefixes:
+            return range(len(self.questions))
+        if len(prefixes) == 1:
+            return self.prefix_index.get(prefixes[0], [])
+        return sorted(i for p in set(prefixes) for i in self.prefix_index.get(p, []))
+
+    def encode_questions(self, questions):
+        """把题目列表编码为JSON数组；题库中的题目直接使用预编码片段"""
+        parts = []
+        for q in questions:
+            ordinal = self.ordinal.get(q.get('id'))
+            if ordinal is not None and self.questions[ordinal] is q:
+                parts.append(self.fragments[ordinal])
+            else:
+                # 不在当前题库中的题目（如错题本里保存的旧副本）
+                parts.append(encode_json(q))
+        return b'[' + b','.join(parts) + b']'
+
+
+class QuestionBank:
+    """进程内常驻的题库，只在文件变化时重新加载"""
+
+    def __init__(self, path=QUESTIONS_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file_state = None
+        self._snapshot = None
+
+    def _stat(self):
+        """返回题库文件的 (mtime, size)，文件不存在时返回 None"""
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def reload(self, force=False):
+        """检查题库文件，mtime/size 变化且内容哈希不同时才重新解析，返回是否换了新版本"""
+        state = self._stat()
+        if not force and state is not None and state == self._file_state:
+            return False
+
+        with self._lock:
+            # 等锁期间可能已被其他线程加载过
+            state = self._stat()
+            if not force and state is not None and state == self._file_state:
+                return False
+
+            if state is None:
+                print("题目文件不存在，从题库文本导入")
+                import_questions.import_questions(questions_file=self.path)
+                state = self._stat()
+                if state is None:
+                    if self._snapshot is None:
+                        self._snapshot = BankSnapshot([], '')
+                    return False
+
+            started = time.perf_counter()
+            try:
+                with open(self.path, 'rb') as f:
+                    raw = f.read()
+            except OSError as e:
+                print(f"读取题库文件失败: {e}")
+                return False
+
+            version = hashlib.sha256(raw).hexdigest()
+            if not force and self._snapshot is not None and version == self._snapshot.version:
+                # 只是文件时间变了，内容没变
+                self._file_state = state
+                return False
+
+            try:
+                questions = json.loads(raw.decode('utf-8'))
+            except ValueError as e:
+                # 文件可能正在被写入，保留旧版本，下次请求再重试
+                print(f"加载题目失败: {e}")
+                if self._snapshot is None:
+                    self._snapshot = BankSnapshot([], '')
+                return False
+
+            metrics.observe_io('load', self.path, time.perf_counter() - started, len(raw))
+
+            # 整体替换快照，正在处理的请求继续使用旧快照
+            self._snapshot = BankSnapshot(questions, version)
+            self._file_state = state
+            print(f"从文件加载 {len(questions)} 道题目 (版本 {version[:12]})")
+            return True
+
+    def snapshot(self):
+        """获取当前题库快照（必要时先重新加载）"""
+        self.reload()
+        return self._snapshot
+
+    def get_questions(self):
+        """获取题目列表"""
+        return self.snapshot().questions
+
+    def get(self, q_id):
+        """按题号获取题目"""
+        return self.snapshot().get(q_id)
+
+    @property
+    def version(self):
+        return self.snapshot().version
+
+
+# 进程级单例
+question_bank = QuestionBank()
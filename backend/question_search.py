@@ -0,0 +1,118 @@
+import math
+import html
+import unicodedata
+
+# 题干与选项的权重：题干命中比选项命中更相关
+STEM_WEIGHT = 2.0
+OPTION_WEIGHT = 1.0
+
+
+def _normalize_char(ch):
+    """全角转半角、大写转小写；逐字符处理，保证与原文的下标一一对应"""
+    normalized = unicodedata.normalize('NFKC', ch).lower()
+    return normalized if len(normalized) == 1 else ch.lower()
+
+
+def _is_cjk(ch):
+    return '一' <= ch <= '鿿' or '㐀' <= ch <= '䶿'
+
+
+def tokenize(text, unigrams=False):
+    """切分词元，生成 (词元, 起始下标, 结束下标)
+
+    中文按相邻两字切分（二元组），单独一个汉字作为一个词元；
+    英文和数字按连续的字母数字切分为整词（如 swr、146、3dbi）。
+    建索引时 unigrams=True，另外为每个汉字生成单字词元，用于查询中单独的汉字
+    """
+    chars = [_normalize_char(ch) for ch in text]
+    i = 0
+    n = len(chars)
+    while i < n:
+        ch = chars[i]
+        if _is_cjk(ch):
+            j = i
+            while j < n and _is_cjk(chars[j]):
+                j += 1
+            if unigrams:
+                for k in range(i, j):
+                    yield chars[k], k, k + 1
+            elif j - i == 1:
+                yield ch, i, j
+            for k in range(i, j - 1):
+                yield chars[k] + chars[k + 1], k, k + 2
+            i = j
+        elif ch.isalnum():
+            j = i
+            while j < n and chars[j].isalnum() and not _is_cjk(chars[j]):
+                j += 1
+            yield ''.join(chars[i:j]), i, j
+            i = j
+        else:
+            i += 1
+
+
+def highlight(text, terms):
+    """把命中的词元用 <mark> 标出，其余文本做 HTML 转义"""
+    spans = sorted((start, end) for token, start, end in tokenize(text, unigrams=True) if token in terms)
+    if not spans:
+        return html.escape(text)
+    # 合并重叠的片段（二元组两两重叠）
+    merged = [list(spans[0])]
+    for start, end in spans[1:]:
+        if start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    parts = []
+    pos = 0
+    for start, end in merged:
+        parts.append(html.escape(text[pos:start]))
+        parts.append('<mark>' + html.escape(text[start:end]) + '</mark>')
+        pos = end
+    parts.append(html.escape(text[pos:]))
+    return ''.join(parts)
+
+
+class SearchIndex:
+    """题干和选项的倒排索引，随题库快照一起构建"""
+
+    def __init__(self, questions):
+        self.questions = questions
+        # 词元 -> {题目序号: 加权词频}
+        self.postings = {}
+        for i, q in enumerate(questions):
+            self._add(i, q.get('question', ''), STEM_WEIGHT)
+            for option in q.get('options', []):
+                self._add(i, option.get('text', ''), OPTION_WEIGHT)
+
+    def _add(self, ordinal, text, weight):
+        for token, _, _ in tokenize(text, unigrams=True):
+            docs = self.postings.setdefault(token, {})
+            docs[ordinal] = docs.get(ordinal, 0.0) + weight
+
+    def search(self, query, limit=20):
+        """搜索题目，返回 (命中总数, [(题目序号, 得分, 命中的词元)])
+
+        先按命中的查询词元数排序，再按 TF-IDF 得分排序；
+        查询有多个词元时，至少要命中一半才算结果
+        """
+        terms = list(dict.fromkeys(token for token, _, _ in tokenize(query)))
+        if not terms:
+            return 0, []
+        n_docs = len(self.questions) or 1
+        scores = {}
+        matched = {}
+        for term in terms:
+            docs = self.postings.get(term)
+            if not docs:
+                continue
+            idf = math.log(1 + n_docs / len(docs))
+            for ordinal, tf in docs.items():
+                scores[ordinal] = scores.get(ordinal, 0.0) + idf * (1 + math.log(tf))
+                matched.setdefault(ordinal, set()).add(term)
+
+        required = (len(terms) + 1) // 2
+        hits = [(len(matched[ordinal]), score, ordinal) for ordinal, score in scores.items()
+                if len(matched[ordinal]) >= required]
+        hits.sort(key=lambda hit: (-hit[0], -hit[1], hit[2]))
+        return len(hits), [(ordinal, score, matched[ordinal]) for _, score, ordinal in hits[:limit]]
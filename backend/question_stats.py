@@ -0,0 +1,66 @@
+"""
+题目难度统计
+每次交卷时按题累加计数器（作答次数、答对次数、首次作答次数和首次答错次数），
+整份答卷的增量合并为一次写入；统计接口直接读取计数器，不需要扫描所有用户的错题本。
+
+"首次作答"指作答时这道题还不在该用户的错题本中。
+"""
+
+# 计数器名称: q:<题号>:<字段>
+COUNTER_PREFIX = 'q:'
+FIELDS = ('attempts', 'correct', 'first_try', 'first_try_wrong')
+
+# /api/stats/questions 支持的排序字段
+SORT_KEYS = ('error_rate', 'first_try_error_rate', 'attempts', 'correct_rate')
+
+
+def record_answer(deltas, q_id, is_correct, first_try):
+    """把一次作答累加到增量 {计数器名称: 增量} 中"""
+    prefix = f'{COUNTER_PREFIX}{q_id}:'
+    deltas[prefix + 'attempts'] = deltas.get(prefix + 'attempts', 0) + 1
+    if is_correct:
+        deltas[prefix + 'correct'] = deltas.get(prefix + 'correct', 0) + 1
+    if first_try:
+        deltas[prefix + 'first_try'] = deltas.get(prefix + 'first_try', 0) + 1
+        if not is_correct:
+            deltas[prefix + 'first_try_wrong'] = deltas.get(prefix + 'first_try_wrong', 0) + 1
+    return deltas
+
+
+def _rate(numerator, denominator):
+    return round(numerator / denominator, 4) if denominator else None
+
+
+def question_rows(counters, bank):
+    """把计数器整理为每道题一行的统计数据"""
+    per_question = {}
+    for name, value in counters.items():
+        q_id, _, field = name[len(COUNTER_PREFIX):].rpartition(':')
+        if field in FIELDS:
+            per_question.setdefault(q_id, dict.fromkeys(FIELDS, 0))[field] = value
+
+    rows = []
+    for q_id, stats in per_question.items():
+        question = bank.get(q_id) or {}
+        attempts = stats['attempts']
+        rows.append({
+            'question_id': q_id,
+            'question_text': question.get('question', ''),
+            'section': question.get('section', ''),
+            'attempts': attempts,
+            'correct': stats['correct'],
+            'correct_rate': _rate(stats['correct'], attempts),
+            'error_rate': _rate(attempts - stats['correct'], attempts),
+            'first_try': stats['first_try'],
+            'first_try_wrong': stats['first_try_wrong'],
+            'first_try_error_rate': _rate(stats['first_try_wrong'], stats['first_try'])
+        })
+    return rows
+
+
+def sort_rows(rows, sort='error_rate', descending=True):
+    """按指定字段排序，没有数据（比率为 None）的题目排在最后"""
+    present = [row for row in rows if row[sort] is not None]
+    missing = [row for row in rows if row[sort] is None]
+    present.sort(key=lambda row: (row[sort], row['attempts']), reverse=descending)
+    return present + missing
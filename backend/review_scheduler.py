@@ -0,0 +1,132 @@
+import heapq
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+# SM-2 间隔重复算法参数
+DEFAULT_EASE = 2.5
+MIN_EASE = 1.3
+# 答对/答错对应的 SM-2 评分（0-5）
+QUALITY_CORRECT = 4
+QUALITY_WRONG = 1
+# 答错后重新学习的间隔
+RELEARN_DELAY = timedelta(minutes=10)
+
+
+def _parse_time(value):
+    try:
+        return datetime.fromisoformat(value) if value else None
+    except (TypeError, ValueError):
+        return None
+
+
+def due_time(entry):
+    """错题的下次复习时间；旧记录没有 due 字段时按最近一次答错的时间算，越早答错越先复习"""
+    return _parse_time(entry.get('due')) or _parse_time(entry.get('last_wrong_time')) or datetime.min
+
+
+def _adjust_ease(entry, quality):
+    ease = entry.get('ease', DEFAULT_EASE)
+    ease += 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02)
+    entry['ease'] = round(max(MIN_EASE, ease), 2)
+
+
+def schedule_wrong(entry, now=None):
+    """答错：重新开始记忆，短时间后再次复习"""
+    now = now or datetime.now()
+    _adjust_ease(entry, QUALITY_WRONG)
+    entry['repetitions'] = 0
+    entry['interval'] = 0
+    entry['due'] = (now + RELEARN_DELAY).isoformat()
+    return entry
+
+
+def schedule_correct(entry, now=None):
+    """答对：复习间隔按 1天、6天、之后每次乘以难度系数 递增"""
+    now = now or datetime.now()
+    repetitions = entry.get('repetitions', 0) + 1
+    if repetitions == 1:
+        interval = 1
+    elif repetitions == 2:
+        interval = 6
+    else:
+        interval = round(max(entry.get('interval', 6), 1) * entry.get('ease', DEFAULT_EASE), 1)
+    _adjust_ease(entry, QUALITY_CORRECT)
+    entry['repetitions'] = repetitions
+    entry['interval'] = interval
+    entry['due'] = (now + timedelta(days=interval)).isoformat()
+    return entry
+
+
+class ReviewQueues:
+    """每个用户一个按复习时间排序的小顶堆，练习时取出最该复习的 k 道题（O(k log n)）
+
+    堆中的过期元素（题目已更新或删除）在取出时丢弃。本进程的修改通过 update 同步；
+    其他进程（多 worker）的修改在队列超过 ttl 秒后重新从存储加载时生效。
+    """
+
+    def __init__(self, store, ttl=60.0, max_users=1000):
+        self.store = store
+        self.ttl = ttl
+        self.max_users = max_users
+        self._lock = threading.Lock()
+        # 用户ID -> (加载时间, 堆[(复习时间, 题号)], 题号 -> 当前复习时间)
+        self._queues = OrderedDict()
+
+    def _queue(self, user_id):
+        queue = self._queues.get(user_id)
+        if queue is not None and time.monotonic() - queue[0] < self.ttl:
+            self._queues.move_to_end(user_id)
+            return queue
+        wrong_questions = self.store.load_wrong_questions(user_id)
+        current = {q_id: due_time(entry) for q_id, entry in wrong_questions.items()}
+        heap = [(due, q_id) for q_id, due in current.items()]
+        heapq.heapify(heap)
+        queue = (time.monotonic(), heap, current)
+        self._queues[user_id] = queue
+        self._queues.move_to_end(user_id)
+        while len(self._queues) > self.max_users:
+            self._queues.popitem(last=False)
+        return queue
+
+    def most_due(self, user_id, k):
+        """按复习时间从早到晚取出 k 道题的题号（不从队列中删除）"""
+        user_id = str(user_id)
+        with self._lock:
+            _, heap, current = self._queue(user_id)
+            picked = []
+            while heap and len(picked) < k:
+                due, q_id = heapq.heappop(heap)
+                if current.get(q_id) != due or q_id in picked:
+                    continue  # 过期元素
+                picked.append(q_id)
+            for q_id in picked:
+                heapq.heappush(heap, (current[q_id], q_id))
+            return picked
+
+    def update(self, user_id, changes):
+        """同步错题本的修改 {题号: 错题记录或None(删除)}"""
+        user_id = str(user_id)
+        with self._lock:
+            queue = self._queues.get(user_id)
+            if queue is None:
+                return
+            _, heap, current = queue
+            for q_id, entry in changes.items():
+                if entry is None:
+                    current.pop(q_id, None)
+                else:
+                    current[q_id] = due_time(entry)
+                    heapq.heappush(heap, (current[q_id], q_id))
+            # 过期元素太多时重建堆
+            if len(heap) > 2 * len(current) + 16:
+                heap[:] = [(due, q_id) for q_id, due in current.items()]
+                heapq.heapify(heap)
+
+    def invalidate(self, user_id=None):
+        with self._lock:
+            if user_id is None:
+                self._queues.clear()
+            else:
+                self._queues.pop(str(user_id), None)
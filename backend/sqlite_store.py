@@ -0,0 +1,300 @@
+import os
+import json
+import sqlite3
+import threading
+
+# 用户表中单独成列的字段，其余字段放在 extra（JSON）中
+USER_COLUMNS = ('user_id', 'phone', 'password', 'is_admin', 'status',
+                'created_at', 'start_time', 'expire_time')
+# 错题表中单独成列的字段
+WRONG_COLUMNS = ('wrong_count', 'correct_count', 'last_wrong_time')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    user_id     TEXT PRIMARY KEY,
+    phone       TEXT NOT NULL UNIQUE,
+    password    TEXT,
+    is_admin    INTEGER NOT NULL DEFAULT 0,
+    status      TEXT,
+    created_at  TEXT,
+    start_time  TEXT,
+    expire_time TEXT,
+    extra       TEXT
+);
+
+CREATE TABLE IF NOT EXISTS wrong_questions (
+    user_id         TEXT NOT NULL,
+    question_id     TEXT NOT NULL,
+    wrong_count     INTEGER NOT NULL DEFAULT 0,
+    correct_count   INTEGER NOT NULL DEFAULT 0,
+    last_wrong_time TEXT,
+    extra           TEXT,
+    PRIMARY KEY (user_id, question_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_wrong_questions_question ON wrong_questions (question_id);
+
+CREATE TABLE IF NOT EXISTS exam_sessions (
+    exam_id    TEXT PRIMARY KEY,
+    user_id    TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    data       TEXT NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_exam_sessions_expires ON exam_sessions (expires_at);
+
+CREATE TABLE IF NOT EXISTS counters (
+    name  TEXT PRIMARY KEY,
+    value INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+# 按 user_id 覆盖写入；手机号与其他用户重复时由 UNIQUE 约束报错，不会误删其他用户
+UPSERT_USER = (
+    'INSERT INTO users VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) '
+    'ON CONFLICT (user_id) DO UPDATE SET '
+    'phone = excluded.phone, password = excluded.password, is_admin = excluded.is_admin, '
+    'status = excluded.status, created_at = excluded.created_at, '
+    'start_time = excluded.start_time, expire_time = excluded.expire_time, extra = excluded.extra'
+)
+
+
+class SQLiteStore:
+    """SQLite存储后端（WAL模式），单条记录的修改只写一行"""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    def after_fork(self):
+        """fork 出的子进程不能复用父进程的连接"""
+        self._local = threading.local()
+
+    def _connect(self):
+        """每个线程使用自己的连接"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('PRAGMA foreign_keys=ON')
+            self._local.conn = conn
+        return conn
+
+    # ---- 行与字典的转换 ----
+    @staticmethod
+    def _user_to_row(user):
+        extra = {k: v for k, v in user.items() if k not in USER_COLUMNS}
+        return (
+            user['user_id'], user['phone'], user.get('password'),
+            1 if user.get('is_admin') else 0, user.get('status'),
+            user.get('created_at'), user.get('start_time'), user.get('expire_time'),
+            json.dumps(extra, ensure_ascii=False) if extra else None
+        )
+
+    @staticmethod
+    def _row_to_user(row):
+        user = {
+            'user_id': row['user_id'],
+            'phone': row['phone'],
+            'password': row['password'],
+            'is_admin': bool(row['is_admin']),
+            'created_at': row['created_at'],
+            'status': row['status']
+        }
+        # 没有时间限制的用户不输出这两个字段，与JSON文件保持一致
+        if row['start_time'] is not None:
+            user['start_time'] = row['start_time']
+        if row['expire_time'] is not None:
+            user['expire_time'] = row['expire_time']
+        if row['extra']:
+            user.update(json.loads(row['extra']))
+        return user
+
+    @staticmethod
+    def _entry_to_row(user_id, q_id, entry):
+        extra = {k: v for k, v in entry.items() if k not in WRONG_COLUMNS}
+        return (
+            str(user_id), q_id, entry.get('wrong_count', 0), entry.get('correct_count', 0),
+            entry.get('last_wrong_time'),
+            json.dumps(extra, ensure_ascii=False) if extra else None
+        )
+
+    @staticmethod
+    def _row_to_entry(row):
+        entry = {}
+        if row['extra']:
+            entry.update(json.loads(row['extra']))
+        entry['wrong_count'] = row['wrong_count']
+        entry['correct_count'] = row['correct_count']
+        entry['last_wrong_time'] = row['last_wrong_time']
+        return entry
+
+    # ---- 用户 ----
+    @staticmethod
+    def _bump_users_revision(conn):
+        conn.execute("INSERT INTO counters (name, value) VALUES ('users_revision', 1) "
+                     "ON CONFLICT (name) DO UPDATE SET value = value + 1")
+
+    def users_revision(self):
+        """用户数据的版本号，每次写用户表都会加一"""
+        row = self._connect().execute("SELECT value FROM counters WHERE name = 'users_revision'").fetchone()
+        return row[0] if row else 0
+
+    def load_users(self):
+        rows = self._connect().execute('SELECT * FROM users ORDER BY rowid').fetchall()
+        return {row['user_id']: self._row_to_user(row) for row in rows}
+
+    def save_users(self, users):
+        """整体替换用户数据（批量操作使用）"""
+        conn = self._connect()
+        with conn:
+            existing = {row[0] for row in conn.execute('SELECT user_id FROM users')}
+            removed = existing - set(users)
+            conn.executemany('DELETE FROM users WHERE user_id = ?', [(u,) for u in removed])
+            conn.executemany(UPSERT_USER, [self._user_to_row(user) for user in users.values()])
+            self._bump_users_revision(conn)
+
+    def save_user(self, user):
+        conn = self._connect()
+        with conn:
+            conn.execute(UPSERT_USER, self._user_to_row(user))
+            self._bump_users_revision(conn)
+
+    def add_users(self, new_users):
+        """批量添加用户（一个事务）；返回因手机号已被其他用户使用而没有添加的用户ID"""
+        conn = self._connect()
+        rejected = []
+        with conn:
+            for user in new_users:
+                try:
+                    conn.execute(UPSERT_USER, self._user_to_row(user))
+                except sqlite3.IntegrityError:
+                    # 其他请求同时添加了相同的手机号（只回滚这一条语句）
+                    rejected.append(user['user_id'])
+            self._bump_users_revision(conn)
+        return rejected
+
+    def delete_user(self, user_id):
+        conn = self._connect()
+        with conn:
+            conn.execute('DELETE FROM users WHERE user_id = ?', (user_id,))
+            self._bump_users_revision(conn)
+
+    # ---- 错题本 ----
+    def load_wrong_questions(self, user_id):
+        rows = self._connect().execute(
+            'SELECT * FROM wrong_questions WHERE user_id = ? ORDER BY rowid', (str(user_id),)
+        ).fetchall()
+        return {row['question_id']: self._row_to_entry(row) for row in rows}
+
+    def get_wrong_question(self, user_id, q_id):
+        row = self._connect().execute(
+            'SELECT * FROM wrong_questions WHERE user_id = ? AND question_id = ?', (str(user_id), q_id)
+        ).fetchone()
+        return self._row_to_entry(row) if row else None
+
+    def load_all_wrong_questions(self):
+        all_wrong_questions = {}
+        for row in self._connect().execute('SELECT * FROM wrong_questions ORDER BY rowid'):
+            all_wrong_questions.setdefault(row['user_id'], {})[row['question_id']] = self._row_to_entry(row)
+        return all_wrong_questions
+
+    def save_wrong_questions(self, user_id, wrong_questions):
+        """整体替换指定用户的错题本"""
+        conn = self._connect()
+        with conn:
+            conn.execute('DELETE FROM wrong_questions WHERE user_id = ?', (str(user_id),))
+            conn.executemany(
+                'INSERT INTO wrong_questions VALUES (?, ?, ?, ?, ?, ?)',
+                [self._entry_to_row(user_id, q_id, entry) for q_id, entry in wrong_questions.items()]
+            )
+
+    def save_all_wrong_questions(self, all_wrong_questions):
+        conn = self._connect()
+        with conn:
+            conn.execute('DELETE FROM wrong_questions')
+            for user_id, wrong_questions in all_wrong_questions.items():
+                conn.executemany(
+                    'INSERT INTO wrong_questions VALUES (?, ?, ?, ?, ?, ?)',
+                    [self._entry_to_row(user_id, q_id, entry) for q_id, entry in wrong_questions.items()]
+                )
+
+    def update_wrong_questions(self, user_id, changes):
+        """按题号更新错题记录，值为 None 表示从错题本删除；每道题只写一行"""
+        conn = self._connect()
+        with conn:
+            for q_id, entry in changes.items():
+                if entry is None:
+                    conn.execute('DELETE FROM wrong_questions WHERE user_id = ? AND question_id = ?',
+                                 (str(user_id), q_id))
+                else:
+                    conn.execute(
+                        'INSERT INTO wrong_questions VALUES (?, ?, ?, ?, ?, ?) '
+                        'ON CONFLICT (user_id, question_id) DO UPDATE SET '
+                        'wrong_count = excluded.wrong_count, correct_count = excluded.correct_count, '
+                        'last_wrong_time = excluded.last_wrong_time, extra = excluded.extra',
+                        self._entry_to_row(user_id, q_id, entry)
+                    )
+
+    # ---- 考试会话 ----
+    def save_exam_session(self, session):
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                'INSERT INTO exam_sessions VALUES (?, ?, ?, ?) '
+                'ON CONFLICT (exam_id) DO UPDATE SET expires_at = excluded.expires_at, data = excluded.data',
+                (session['exam_id'], str(session['user_id']), session['expires_at'],
+                 json.dumps(session, ensure_ascii=False))
+            )
+
+    def update_open_exam_session(self, session):
+        """会话尚未交卷时才写入（交卷和保存进度使用），返回是否写入"""
+        conn = self._connect()
+        with conn:
+            return conn.execute(
+                "UPDATE exam_sessions SET data = ? "
+                "WHERE exam_id = ? AND NOT json_extract(data, '$.submitted')",
+                (json.dumps(session, ensure_ascii=False), session['exam_id'])
+            ).rowcount == 1
+
+    def load_exam_session(self, exam_id):
+        row = self._connect().execute(
+            'SELECT data FROM exam_sessions WHERE exam_id = ?', (exam_id,)
+        ).fetchone()
+        return json.loads(row['data']) if row else None
+
+    def delete_exam_session(self, exam_id):
+        conn = self._connect()
+        with conn:
+            conn.execute('DELETE FROM exam_sessions WHERE exam_id = ?', (exam_id,))
+
+    def purge_exam_sessions(self, now):
+        conn = self._connect()
+        with conn:
+            return conn.execute('DELETE FROM exam_sessions WHERE expires_at < ?', (now,)).rowcount
+
+    # ---- 计数器（答题统计） ----
+    def incr_counters(self, deltas):
+        """批量累加计数器 {名称: 增量}"""
+        conn = self._connect()
+        with conn:
+            conn.executemany(
+                'INSERT INTO counters (name, value) VALUES (?, ?) '
+                'ON CONFLICT (name) DO UPDATE SET value = value + excluded.value',
+                list(deltas.items())
+            )
+
+    def load_counters(self, prefix=''):
+        """读取名称以 prefix 开头的计数器"""
+        rows = self._connect().execute(
+            'SELECT name, value FROM counters WHERE name >= ? AND name < ?',
+            (prefix, prefix + '\uffff')
+        ).fetchall()
+        return {row['name']: row['value'] for row in rows}
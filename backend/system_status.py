@@ -0,0 +1,72 @@
+import time
+import threading
+
+
+class WrongBookCounters:
+    """错题本条目数的内存计数器（/api/system/status 使用）
+
+    第一次使用时扫描一次全部错题本，之后由各写入路径按增量更新，查询不再读取数据文件。
+    多 worker 部署时其他进程的写入本进程看不到，每隔 resync_interval 秒重新扫描一次校正
+    （0 表示不重新扫描，适用于单进程部署）。
+    """
+
+    def __init__(self, store, resync_interval=300.0):
+        self.store = store
+        self.resync_interval = resync_interval
+        self._lock = threading.Lock()
+        self._per_user = None
+        self._total = 0
+        self._synced_at = 0.0
+
+    def _sync(self):
+        all_wrong_questions = self.store.load_all_wrong_questions()
+        per_user = {str(user_id): len(wrong_questions)
+                    for user_id, wrong_questions in all_wrong_questions.items() if wrong_questions}
+        with self._lock:
+            self._per_user = per_user
+            self._total = sum(per_user.values())
+            self._synced_at = time.monotonic()
+
+    def _ensure_synced(self):
+        if self._per_user is None or (
+                self.resync_interval and time.monotonic() - self._synced_at >= self.resync_interval):
+            self._sync()
+
+    def _set_count(self, user_id, count):
+        self._total += count - self._per_user.get(user_id, 0)
+        if count:
+            self._per_user[user_id] = count
+        else:
+            self._per_user.pop(user_id, None)
+
+    def add(self, user_id, delta):
+        """用户错题本条目数变化 delta"""
+        if not delta or self._per_user is None:
+            # 还没有扫描过时不需要记录，第一次查询时会扫描
+            return
+        user_id = str(user_id)
+        with self._lock:
+            self._set_count(user_id, max(0, self._per_user.get(user_id, 0) + delta))
+
+    def set(self, user_id, count):
+        """用户错题本被整体替换"""
+        if self._per_user is None:
+            return
+        with self._lock:
+            self._set_count(str(user_id), count)
+
+    def reset(self, all_wrong_questions=None):
+        """所有用户的错题本被整体替换"""
+        if self._per_user is None:
+            return
+        with self._lock:
+            self._per_user = {str(user_id): len(wrong_questions)
+                              for user_id, wrong_questions in (all_wrong_questions or {}).items()
+                              if wrong_questions}
+            self._total = sum(self._per_user.values())
+
+    def snapshot(self):
+        """返回 (错题总数, {用户ID: 错题数})"""
+        self._ensure_synced()
+        with self._lock:
+            return self._total, dict(self._per_user)
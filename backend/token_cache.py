@@ -0,0 +1,87 @@
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+class TokenCache:
+    """已验证令牌的 LRU 缓存
+
+    以令牌的 sha256 摘要为键保存解码后的声明，到令牌的 exp 为止有效，
+    同一个令牌再次请求时不需要重新验证签名和解析。
+    用户被删除、令牌被吊销或修改密码时通过 evict_user 清除该用户的缓存。
+    """
+
+    def __init__(self, max_size=10000):
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        # 摘要 -> (声明, 过期时间戳)
+        self._entries = OrderedDict()
+        # 用户ID -> 该用户已缓存令牌的摘要
+        self._by_user = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _key(token):
+        return hashlib.sha256(token.encode('utf-8')).digest()
+
+    def get(self, token):
+        """返回缓存的声明，未缓存或已过期返回 None"""
+        key = self._key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            claims, expires_at = entry
+            if expires_at <= time.time():
+                self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return claims
+
+    def put(self, token, claims):
+        """缓存验证通过的令牌；没有 exp 的令牌不缓存"""
+        expires_at = claims.get('exp')
+        if not expires_at or not self.max_size:
+            return
+        key = self._key(token)
+        with self._lock:
+            self._entries[key] = (claims, expires_at)
+            self._entries.move_to_end(key)
+            self._by_user.setdefault(claims.get('user_id'), set()).add(key)
+            while len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _remove(self, key):
+        claims, _ = self._entries.pop(key)
+        keys = self._by_user.get(claims.get('user_id'))
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_user[claims.get('user_id')]
+
+    def evict_user(self, user_id):
+        """清除某个用户的全部缓存令牌（吊销、删除用户、修改密码时调用）"""
+        with self._lock:
+            for key in list(self._by_user.get(user_id, ())):
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_user.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
@@ -0,0 +1,223 @@
+import time
+import threading
+from datetime import datetime
+
+
+def parse_user_time(value):
+    """解析用户的开始/到期时间，格式错误返回 None（视为没有限制）"""
+    if not value:
+        return None
+    try:
+        dt = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except (AttributeError, TypeError, ValueError):
+        return None
+    if dt.tzinfo is not None:
+        # 带时区的时间转换为本地时间，和 datetime.now() 比较
+        dt = dt.astimezone().replace(tzinfo=None)
+    return dt
+
+def check_access_window(is_admin, start_dt, expire_dt, expire_time=None, now=None):
+    """根据已解析的时间窗口检查访问权限"""
+    if is_admin:
+        return {'access': True, 'message': '管理员无时间限制'}
+
+    now = now or datetime.now()
+
+    # 检查开始时间
+    if start_dt and now < start_dt:
+        return {'access': False, 'message': '账号未到生效时间'}
+
+    # 检查到期时间
+    if expire_dt and now > expire_dt:
+        return {'access': False, 'message': '当前账号已到期，请联系管理员！'}
+
+    # 计算剩余天数
+    days_left = None
+    if expire_dt:
+        # 计算总的小时差，然后向上取整到天数
+        total_hours = (expire_dt - now).total_seconds() / 3600
+        if total_hours > 0:
+            # 如果还有时间，至少显示1天
+            days_left = max(1, int((total_hours + 23) // 24))
+        else:
+            days_left = 0
+
+    return {
+        'access': True,
+        'days_left': days_left,
+        'expire_time': expire_time
+    }
+
+
+def check_claims_window(claims, now=None):
+    """根据令牌中签名的有效期窗口（时间戳）检查访问权限，不需要读取用户数据"""
+    if claims.get('is_admin'):
+        return {'access': True, 'message': '管理员无时间限制'}
+
+    now = now or time.time()
+    if claims.get('vs') and now < claims['vs']:
+        return {'access': False, 'message': '账号未到生效时间'}
+    if claims.get('ve') and now > claims['ve']:
+        return {'access': False, 'message': '当前账号已到期，请联系管理员！'}
+    return {'access': True}
+
+
+class UserEntry:
+    """目录中的一个用户：原始数据和预先解析好的时间窗口"""
+
+    __slots__ = ('user', 'start_dt', 'expire_dt')
+
+    def __init__(self, user):
+        self.user = user
+        self.start_dt = parse_user_time(user.get('start_time'))
+        self.expire_dt = parse_user_time(user.get('expire_time'))
+
+    @property
+    def revision(self):
+        return self.user.get('revision', 0)
+
+    def check_access(self, now=None):
+        return check_access_window(self.user.get('is_admin', False), self.start_dt, self.expire_dt,
+                                   self.user.get('expire_time'), now)
+
+
+class UserDirectory:
+    """常驻内存的用户目录，带手机号索引
+
+    本进程内的写入通过 put/remove 同步；其他进程（多 worker）写入的数据
+    每隔 check_interval 秒通过存储的版本号发现并重新加载。
+    """
+
+    def __init__(self, store, check_interval=1.0):
+        self.store = store
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._by_phone = {}
+        self._revision = None
+        self._checked_at = 0.0
+        self._reloaded_at = 0.0
+        self._loaded = False
+        # 已删除的用户ID（吊销表），这些用户的令牌一律失效
+        self._deleted = set()
+
+    def reload(self):
+        """从存储重新加载全部用户"""
+        with self._lock:
+            revision = self.store.users_revision()
+            users = self.store.load_users()
+            entries = {user_id: UserEntry(user) for user_id, user in users.items()}
+            if self._loaded:
+                self._deleted |= set(self._entries) - set(entries)
+            self._deleted -= set(entries)
+            by_phone = {}
+            for entry in entries.values():
+                by_phone.setdefault(entry.user.get('phone'), []).append(entry)
+            # 整体替换，读取方不需要加锁
+            self._entries, self._by_phone = entries, by_phone
+            self._revision = revision
+            self._checked_at = self._reloaded_at = time.monotonic()
+            self._loaded = True
+
+    def _maybe_refresh(self):
+        if not self._loaded:
+            self.reload()
+            return
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return
+        self._checked_at = now
+        if self.store.users_revision() != self._revision:
+            self.reload()
+
+    # ---- 查询 ----
+    def get_entry(self, user_id, reload_if_missing=False):
+        self._maybe_refresh()
+        entry = self._entries.get(user_id)
+        if entry is None and reload_if_missing and user_id not in self._deleted \
+                and time.monotonic() - self._reloaded_at >= self.check_interval:
+            # 可能是其他进程刚添加的用户，立即重新加载一次（限频）
+            self.reload()
+            entry = self._entries.get(user_id)
+        return entry
+
+    def get(self, user_id):
+        """按用户ID获取用户数据（只读，修改前请先复制）"""
+        entry = self.get_entry(user_id)
+        return entry.user if entry else None
+
+    def find_by_phone(self, phone, active_only=False):
+        """按手机号查找用户"""
+        self._maybe_refresh()
+        for entry in self._by_phone.get(phone, ()):
+            if not active_only or entry.user.get('status') == 'active':
+                return entry.user
+        return None
+
+    def check_access(self, user_id):
+        """检查用户访问权限，用户不存在时返回 None"""
+        entry = self.get_entry(user_id)
+        return entry.check_access() if entry else None
+
+    def token_status(self, user_id, revision):
+        """对照吊销/版本表检查令牌中的用户版本号
+
+        返回 'current'（令牌中的有效期可直接使用）、'revoked'（令牌已失效）
+        或 'unknown'（本进程的目录还没看到更新，需要按用户数据检查）
+        """
+        entry = self.get_entry(user_id, reload_if_missing=True)
+        if entry is None:
+            return 'revoked'
+        if entry.revision > revision:
+            return 'revoked'
+        if entry.revision == revision:
+            return 'current'
+        return 'unknown'
+
+    def all_entries(self):
+        self._maybe_refresh()
+        return list(self._entries.values())
+
+    def __len__(self):
+        self._maybe_refresh()
+        return len(self._entries)
+
+    # ---- 与写入保持同步 ----
+    def _invalidate_revision(self):
+        # 本进程写入后存储版本号会变化，下次检查时再与存储核对一次
+        self._revision = None
+
+    def put(self, user):
+        with self._lock:
+            entries = dict(self._entries)
+            entries[user['user_id']] = UserEntry(user)
+            self._deleted.discard(user['user_id'])
+            self._set(entries)
+
+    def put_many(self, users):
+        with self._lock:
+            entries = dict(self._entries)
+            for user in users:
+                entries[user['user_id']] = UserEntry(user)
+                self._deleted.discard(user['user_id'])
+            self._set(entries)
+
+    def remove(self, user_id):
+        with self._lock:
+            entries = dict(self._entries)
+            entries.pop(user_id, None)
+            self._deleted.add(user_id)
+            self._set(entries)
+
+    def replace_all(self, users):
+        with self._lock:
+            self._deleted |= set(self._entries) - set(users)
+            self._deleted -= set(users)
+            self._set({user_id: UserEntry(user) for user_id, user in users.items()})
+
+    def _set(self, entries):
+        by_phone = {}
+        for entry in entries.values():
+            by_phone.setdefault(entry.user.get('phone'), []).append(entry)
+        self._entries, self._by_phone = entries, by_phone
+        self._invalidate_revision()
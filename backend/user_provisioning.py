@@ -0,0 +1,98 @@
+"""
+批量添加用户
+管理员一次提交一个班的学员（CSV 或 JSON），逐行校验手机号和有效期，
+所有新用户一次写入存储，并返回每一行的处理结果。
+
+CSV 每行: 手机号,开始时间,到期时间（后两列可省略，第一行可以是表头 phone,start_time,expire_time）
+JSON: {"users": [{"phone": ..., "start_time": ..., "expire_time": ...}, ...]} 或直接是列表，
+      列表元素也可以只是手机号字符串
+"""
+
+import csv
+import io
+import re
+import secrets
+from datetime import datetime
+
+from user_directory import parse_user_time
+
+PHONE_PATTERN = re.compile(r'^1\d{10}$')
+COLUMNS = ('phone', 'start_time', 'expire_time')
+
+
+def new_user_id():
+    """生成用户ID：时间戳加随机后缀，同一秒内添加多个用户也不会重复"""
+    return f"user_{datetime.now().strftime('%Y%m%d%H%M%S')}_{secrets.token_hex(3)}"
+
+
+def parse_csv(text):
+    """把 CSV 文本解析为 [{'phone', 'start_time', 'expire_time'}]，跳过空行和表头"""
+    rows = []
+    for cells in csv.reader(io.StringIO(text)):
+        cells = [cell.strip() for cell in cells]
+        if not any(cells):
+            continue
+        if not rows and cells[0].lower() in ('phone', '手机号'):
+            continue
+        rows.append(dict(zip(COLUMNS, cells)))
+    return rows
+
+
+def parse_json_rows(data):
+    """把请求中的 JSON 解析为行列表，格式不对时返回 None"""
+    if isinstance(data, dict):
+        data = data.get('users')
+    if not isinstance(data, list):
+        return None
+    rows = []
+    for item in data:
+        if isinstance(item, dict):
+            rows.append({key: item.get(key) for key in COLUMNS})
+        else:
+            rows.append({'phone': item})
+    return rows
+
+
+def validate_rows(rows, find_by_phone, defaults=None):
+    """逐行校验，返回 (有效行, 每行结果)
+
+    有效行为 (该行的结果, 手机号, 开始时间, 到期时间)；没有填写时间的行使用 defaults 中的时间。
+    手机号在已有用户（find_by_phone）或本批前面的行中出现过的行标记为错误。
+    """
+    defaults = defaults or {}
+    seen = set()
+    valid = []
+    results = []
+    for row_number, row in enumerate(rows, 1):
+        phone = str(row.get('phone') or '').strip()
+        start_time = row.get('start_time') or defaults.get('start_time')
+        expire_time = row.get('expire_time') or defaults.get('expire_time')
+        result = {'row': row_number, 'phone': phone}
+        results.append(result)
+
+        error = None
+        if not PHONE_PATTERN.match(phone):
+            error = '手机号格式不正确'
+        elif phone in seen:
+            error = '手机号在本次导入中重复'
+        elif find_by_phone(phone):
+            error = '该手机号已被注册'
+        elif start_time and not isinstance(start_time, str):
+            error = '开始时间必须是字符串'
+        elif expire_time and not isinstance(expire_time, str):
+            error = '到期时间必须是字符串'
+        elif start_time and parse_user_time(start_time) is None:
+            error = '开始时间格式不正确'
+        elif expire_time and parse_user_time(expire_time) is None:
+            error = '到期时间格式不正确'
+        elif start_time and expire_time and parse_user_time(start_time) >= parse_user_time(expire_time):
+            error = '到期时间必须晚于开始时间'
+
+        if phone:
+            seen.add(phone)
+        if error:
+            result.update(status='error', error=error)
+            continue
+        result['status'] = 'ok'
+        valid.append((result, phone, start_time, expire_time))
+    return valid, results
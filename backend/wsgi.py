@@ -0,0 +1,40 @@
+"""
+生产环境入口
+
+    gunicorn -c gunicorn.conf.py wsgi:application
+
+没有 gunicorn 的环境（如 Windows）可以用 waitress:
+
+    python wsgi.py
+"""
+
+from config import BIND, THREADS
+
+
+def create_app():
+    """创建应用并预加载共享状态（题库、用户目录、错题计数），在 fork worker 之前调用"""
+    # 先迁移旧版错题文件，再创建存储
+    from migrate_wrong_questions_to_shards import migrate_on_startup
+    migrate_on_startup()
+
+    import app as app_module
+
+    app_module.init_default_admin()
+    app_module.question_bank.reload()
+    app_module.user_directory.reload()
+    app_module.wrong_book_counters.snapshot()
+    print(f"已预加载 {len(app_module.question_bank.snapshot())} 道题目、{len(app_module.user_directory)} 个用户")
+    return app_module.app
+
+
+application = create_app()
+
+if __name__ == '__main__':
+    try:
+        from waitress import serve
+    except ImportError:
+        print("未安装 waitress，请使用: gunicorn -c gunicorn.conf.py wsgi:application")
+        raise SystemExit(1)
+    host, port = BIND.rsplit(':', 1)
+    print(f"waitress 运行在: http://{host}:{port}（{THREADS} 个线程）")
+    serve(application, host=host, port=int(port), threads=THREADS)
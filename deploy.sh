@@ -80,14 +80,14 @@ else
 fi
 
 # 测试API
-if curl -s http://localhost:5001/api/questions > /dev/null; then
+if curl -sf http://localhost:5001/api/health > /dev/null; then
     echo "✓ 后端API响应正常"
 else
     echo "✗ 后端API响应异常"
 fi
 
 # 测试Nginx代理
-if curl -s http://localhost/radio/api/questions > /dev/null; then
+if curl -sf http://localhost/radio/api/health > /dev/null; then
     echo "✓ Nginx代理正常"
 else
     echo "✗ Nginx代理异常"